@@ -0,0 +1,89 @@
+"""
+Speaker/segment alignment benchmark on synthetic inputs.
+
+    python benchmarks/bench_align.py --turns 10000
+
+Prints a JSON report comparing `sonify.align.align_segments` against the
+quadratic loop `diarize_audio` used before (timed on a subset, since it
+does not finish in reasonable time at full size).
+"""
+import argparse
+import json
+import random
+import time
+
+from sonify.align import align_segments
+
+
+def synth(n_turns: int, seed: int = 0):
+    rng = random.Random(seed)
+    turns, segments, t = [], [], 0.0
+    for i in range(n_turns):
+        dur = rng.uniform(1.0, 12.0)
+        # occasional overlapped speech
+        start = max(0.0, t - (rng.uniform(0.0, 1.0) if rng.random() < 0.1 else 0.0))
+        turns.append((f"SPEAKER_{rng.randrange(4):02d}", start, start + dur))
+        t = start + dur + rng.uniform(0.0, 1.5)
+    t = 0.0
+    while t < turns[-1][2]:
+        dur = rng.uniform(0.5, 8.0)
+        segments.append({"start": t, "end": t + dur, "text": f" seg {len(segments)}"})
+        t += dur + rng.uniform(0.0, 0.5)
+    return turns, segments
+
+
+def legacy_align(raw_turns, segments):
+    aligned, used = [], set()
+    for speaker, start, end in raw_turns:
+        texts = []
+        for idx, seg in enumerate(segments):
+            if idx in used:
+                continue
+            if seg["start"] < end and seg["end"] > start:
+                texts.append(seg["text"].strip())
+                used.add(idx)
+        if texts:
+            aligned.append({"speaker": speaker, "start": start, "end": end, "text": " ".join(texts)})
+    return aligned
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--legacy_turns", type=int, default=1_000, help="Size for the quadratic baseline")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    turns, segments = synth(args.turns)
+    sweep = best_of(lambda: align_segments(turns, segments), args.repeat)
+
+    small_turns, small_segments = synth(args.legacy_turns)
+    legacy_small = best_of(lambda: legacy_align(small_turns, small_segments), 1)
+    sweep_small = best_of(lambda: align_segments(small_turns, small_segments), args.repeat)
+
+    print(json.dumps({
+        "turns": len(turns),
+        "segments": len(segments),
+        "sweep_seconds": round(sweep, 4),
+        "segments_per_second": round(len(segments) / sweep),
+        "legacy_subset": {
+            "turns": len(small_turns),
+            "segments": len(small_segments),
+            "legacy_seconds": round(legacy_small, 4),
+            "sweep_seconds": round(sweep_small, 4),
+            "speedup": round(legacy_small / sweep_small, 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Deterministic stand-ins for Whisper and pyannote.
+
+`install()` swaps the loaders of the process-wide model registries, so every
+sonify code path (registry lookups, caching, chunking, alignment) runs as
+usual while the "models" cost next to nothing. Outputs depend only on the
+audio length, so runs are reproducible and comparable across machines.
+"""
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SEGMENT_SECONDS = 4.0
+WORDS_PER_SEGMENT = 6
+TURN_SECONDS = 11.0
+
+
+def _duration(audio: Any) -> float:
+    if isinstance(audio, np.ndarray):
+        return len(audio) / SAMPLE_RATE
+    from sonify.utils.audio import wav_info
+    return wav_info(audio).duration
+
+
+class FakeWhisper:
+    """Answers `transcribe()` like Whisper: one segment per 4 s, word timestamps included."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def transcribe(self, audio: Any, language: str | None = None, **_: Any) -> Dict[str, Any]:
+        duration = _duration(audio)
+        segments: List[Dict[str, Any]] = []
+        t = 0.0
+        while t < duration:
+            end = min(t + SEGMENT_SECONDS, duration)
+            step = (end - t) / WORDS_PER_SEGMENT
+            words = [
+                {"word": f" w{len(segments)}_{j}", "start": round(t + j * step, 3),
+                 "end": round(t + (j + 1) * step, 3), "probability": 0.9}
+                for j in range(WORDS_PER_SEGMENT)
+            ]
+            segments.append({
+                "id": len(segments), "seek": int(t * 100), "start": round(t, 3), "end": round(end, 3),
+                "text": "".join(w["word"] for w in words),
+                "tokens": [50364 + (len(segments) * 7 + j) % 1000 for j in range(12)],
+                "temperature": 0.0, "avg_logprob": -0.25, "compression_ratio": 1.3,
+                "no_speech_prob": 0.02, "words": words,
+            })
+            t = end
+        return {"text": "".join(s["text"] for s in segments), "segments": segments,
+                "language": language or "en"}
+
+
+class _Segment:
+    def __init__(self, start: float, end: float):
+        self.start, self.end = start, end
+
+
+class _Annotation:
+    def __init__(self, tracks):
+        self._tracks = tracks
+
+    def itertracks(self, yield_label: bool = False):
+        for start, end, speaker in self._tracks:
+            yield (_Segment(start, end), None, speaker) if yield_label else (_Segment(start, end), None)
+
+    def labels(self) -> List[str]:
+        return sorted({speaker for _, _, speaker in self._tracks})
+
+
+class FakeDiarization:
+    """Callable like a pyannote pipeline: alternating speakers every 11 s, slight overlaps."""
+
+    def __call__(self, wav_path: str, hook=None, return_embeddings: bool = False, **_: Any):
+        duration = _duration(wav_path)
+        tracks, t, i = [], 0.0, 0
+        while t < duration:
+            end = min(t + TURN_SECONDS, duration)
+            tracks.append((t, end, f"SPEAKER_{i % 3:02d}"))
+            t, i = end - 0.3 if end < duration else end, i + 1
+        annotation = _Annotation(tracks)
+        embeddings = np.ones((len(annotation.labels()), 4), dtype=np.float32)
+        return (annotation, embeddings) if return_embeddings else annotation
+
+
+def install():
+    """Route the Whisper and pyannote registries to the fakes (this process only)."""
+    from sonify.utils.models import diarization_pipelines, whisper_models
+
+    os.environ.setdefault("SONIFY_DEVICE", "cpu")
+    whisper_models.loader = lambda name, device, dtype: FakeWhisper(name)
+    whisper_models.sizer = lambda _: 0
+    diarization_pipelines.loader = lambda model_id, token_id, hf_token=None: FakeDiarization()
+    whisper_models.unload()
+    diarization_pipelines.unload()
@@ -0,0 +1,75 @@
+"""
+Import-time budget check for the CLI.
+
+    PYTHONPATH=. python benchmarks/import_budget.py
+    PYTHONPATH=. python benchmarks/import_budget.py --budget_ms 300 --repeat 10
+
+Each probe runs in a fresh interpreter with HOME and SONIFY_CACHE_DIR pointing
+into an empty temporary directory. It fails (exit code 1) if importing
+`sonify.cli`, or running `sonify --help`, pulls in a heavy dependency, creates
+files, or takes longer than the budget (median wall time). Run it after adding
+imports to any module the CLI reaches.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+
+HEAVY = ("torch", "whisper", "pyannote", "lightning", "pytorch_lightning", "streamlit")
+
+PROBES = {
+    "import": "import sonify.cli",
+    "help": "import sys; sys.argv = ['sonify', '--help']\n"
+            "from sonify.cli import main\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass",
+}
+
+# Appended to each probe: wall time of the probe itself and heavy modules it loaded
+REPORT = """
+import json, sys, time
+print(json.dumps({"ms": (time.perf_counter() - _t0) * 1000,
+                  "heavy": sorted({m.split(".")[0] for m in sys.modules} & set(%r))}))
+""" % (HEAVY,)
+
+
+def run_probe(code: str, home: Path) -> dict:
+    env = dict(os.environ, HOME=str(home), SONIFY_CACHE_DIR=str(home / "cache"))
+    src = "import time; _t0 = time.perf_counter()\n" + code + "\n" + REPORT
+    proc = subprocess.run([sys.executable, "-c", src], env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--budget_ms", type=float, default=500.0, help="Median wall-time budget per probe")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failures, report = [], {}
+    for name, code in PROBES.items():
+        with tempfile.TemporaryDirectory(prefix="sonify-import-") as tmp:
+            home = Path(tmp)
+            runs = [run_probe(code, home) for _ in range(args.repeat)]
+            created = sorted(str(p.relative_to(home)) for p in home.rglob("*"))
+        ms = round(median(r["ms"] for r in runs), 1)
+        heavy = sorted({m for r in runs for m in r["heavy"]})
+        report[name] = {"median_ms": ms, "heavy_modules": heavy, "created": created}
+        if heavy:
+            failures.append(f"{name}: imports {', '.join(heavy)}")
+        if created:
+            failures.append(f"{name}: creates {', '.join(created)}")
+        if ms > args.budget_ms:
+            failures.append(f"{name}: {ms} ms exceeds the {args.budget_ms:g} ms budget")
+
+    print(json.dumps(report, indent=2))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Offline benchmark suite for the sonify pipeline stages.
+
+    PYTHONPATH=. python benchmarks/run.py --seconds 600 --repeat 5 --out bench.json
+    PYTHONPATH=. python benchmarks/run.py --stage stream --stage cache_io
+    SONIFY_CPUS=8 PYTHONPATH=. python benchmarks/run.py --stage scaling
+
+Every stage runs in its own process against an empty cache directory, on
+synthetic audio, with Whisper and pyannote replaced by the deterministic
+fakes in `benchmarks/fakes.py`. Nothing is downloaded. The JSON report holds
+latency percentiles, throughput and peak RSS per stage, so two runs (or two
+candidate implementations) can be compared on identical inputs.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+# -----------------------------------------------------------------------------
+# Measurement helpers
+# -----------------------------------------------------------------------------
+
+def latency(times: List[float]) -> Dict[str, float]:
+    ms = np.asarray(times) * 1000.0
+    return {
+        "runs": len(times),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int, setup: Callable[[], None] | None = None) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def synth_wav(path: Path, seconds: float, rate: int = SAMPLE_RATE, channels: int = 1, seed: int = 0) -> Path:
+    """Tones + noise in 'utterances' separated by pauses, so VAD has work to do."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    voiced = (np.sin(2 * np.pi * t / 7.0) > -0.6).astype(np.float32)  # ~70 % speech
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 330 * t)
+    audio = voiced * signal + 0.01 * rng.standard_normal(n)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return path
+
+
+# -----------------------------------------------------------------------------
+# Stages (each runs in a fresh child process, see `main`)
+# -----------------------------------------------------------------------------
+
+def stage_cached_wav(args, work: Path) -> Dict[str, Any]:
+    if not shutil.which("ffmpeg"):
+        return {"skipped": "ffmpeg not found"}
+    from sonify.transcribe import cached_wav
+    from sonify.utils.cache import store
+
+    src = synth_wav(work / "source.wav", args.seconds, rate=44100, channels=2)
+    digest = store.digest(src)
+    cold = timed(lambda: cached_wav(str(src)), args.repeat,
+                 setup=lambda: store.remove("wav", digest, ".wav"))
+    warm = timed(lambda: cached_wav(str(src)), args.repeat)
+    return {
+        "audio_seconds": args.seconds,
+        "convert": latency(cold),
+        "convert_x_realtime": round(args.seconds / float(np.median(cold)), 1),
+        "cache_hit": latency(warm),
+    }
+
+
+def stage_hashing(args, work: Path) -> Dict[str, Any]:
+    from sonify.utils.cache import digest_file, store
+
+    src = synth_wav(work / "audio.wav", args.seconds)
+    size_mb = src.stat().st_size / (1 << 20)
+    cold = timed(lambda: digest_file(src), args.repeat)
+    store.digest(src)
+    indexed = timed(lambda: store.digest(src), args.repeat)
+    return {
+        "file_mb": round(size_mb, 1),
+        "full_hash": latency(cold),
+        "hash_mb_per_s": round(size_mb / float(np.median(cold)), 1),
+        "indexed_lookup": latency(indexed),
+    }
+
+
+def stage_chunking(args, work: Path) -> Dict[str, Any]:
+    from sonify.transcribe import _plan_spans
+    from sonify.utils.audio import load_pcm, wav_info
+
+    src = synth_wav(work / "audio.wav", args.seconds)
+    info = wav_info(str(src))
+    samples = load_pcm(str(src))
+    fixed = timed(lambda: _plan_spans(samples, info, 30, False), args.repeat)
+    vad = timed(lambda: _plan_spans(samples, info, 30, True), args.repeat)
+    return {
+        "audio_seconds": args.seconds,
+        "fixed": latency(fixed),
+        "vad": latency(vad),
+        "vad_x_realtime": round(args.seconds / float(np.median(vad)), 1),
+        "vad_chunks": len(_plan_spans(samples, info, 30, True)),
+    }
+
+
+def stage_stream(args, work: Path) -> Dict[str, Any]:
+    import fakes
+    from sonify.transcribe import transcribe_stream
+
+    fakes.install()
+    src = str(synth_wav(work / "audio.wav", args.seconds))
+    runs = iter(range(1 << 30))
+
+    def cold():
+        # a new model name per run: nothing is cached yet
+        return list(transcribe_stream(src, f"fake-{next(runs)}", "en", chunk_size=30))
+
+    cold_times = timed(cold, args.repeat)
+    list(transcribe_stream(src, "fake-warm", "en", chunk_size=30))
+    warm_times = timed(lambda: list(transcribe_stream(src, "fake-warm", "en", chunk_size=30)), args.repeat)
+    chunks = -(-int(args.seconds) // 30)
+    return {
+        "audio_seconds": args.seconds,
+        "chunks": chunks,
+        "cold": latency(cold_times),
+        "cold_ms_per_chunk": round(float(np.median(cold_times)) * 1000 / chunks, 3),
+        "warm": latency(warm_times),
+        "warm_ms_per_chunk": round(float(np.median(warm_times)) * 1000 / chunks, 3),
+    }
+
+
+def stage_cache_io(args, work: Path) -> Dict[str, Any]:
+    import fakes
+    from sonify.utils.cache import store
+
+    result = fakes.FakeWhisper("fake").transcribe(np.zeros(int(args.seconds * SAMPLE_RATE), dtype=np.float32))
+    n = len(result["segments"])
+    out: Dict[str, Any] = {"segments": n}
+    for fmt, write, read in (
+            ("columnar", store.write_result, store.read_result),
+            ("json", store.write_json, store.read_json),
+    ):
+        key = f"bench-{fmt}"
+        out[fmt] = {
+            "save": latency(timed(lambda: write("bench", key, result), args.repeat)),
+            "load": latency(timed(lambda: read("bench", key), args.repeat)),
+            "bytes": store.path("bench", key, ".sonr" if fmt == "columnar" else ".json").stat().st_size,
+        }
+    out["columnar"]["load_start_end_text"] = latency(
+        timed(lambda: store.read_result("bench", "bench-columnar", ("start", "end", "text")), args.repeat)
+    )
+    out["segments_per_s_columnar_load"] = round(n / (out["columnar"]["load"]["p50_ms"] / 1000.0))
+    return out
+
+
+def stage_alignment(args, work: Path) -> Dict[str, Any]:
+    import fakes
+    from sonify.align import align_segments
+    from sonify.diarize import diarize_audio
+    from sonify.utils.cache import store
+
+    fakes.install()
+    # already 16 kHz mono: publish it as the converted WAV, so ffmpeg is not needed
+    synth = synth_wav(work / "audio.wav", args.seconds)
+    src = store.fill("wav", store.digest(synth), lambda tmp: shutil.copyfile(synth, tmp), ".wav")
+    segments = fakes.FakeWhisper("fake").transcribe(str(src))["segments"]
+    # a progress callback avoids pyannote's own ProgressHook (pyannote need not be installed)
+    diarize_audio(str(src), segments, "token", progress_callback=lambda *_: None)  # fills the raw-turn cache
+    cached = timed(lambda: diarize_audio(str(src), segments, "token"), args.repeat)
+
+    from sonify.diarize import cached_turns
+    turns = [(t["speaker"], t["start"], t["end"]) for t in cached_turns(str(src))["turns"]]
+    sweep = timed(lambda: align_segments(turns, segments, use_words=True), args.repeat)
+    return {
+        "segments": len(segments),
+        "turns": len(turns),
+        "diarize_audio_cached": latency(cached),
+        "align_words": latency(sweep),
+        "segments_per_s": round(len(segments) / float(np.median(sweep))),
+    }
+
+
+FFT_ROUNDS = 10
+
+
+def _warm(_):
+    time.sleep(0.05)
+
+
+def _model_chunk(_) -> None:
+    """CPU-bound stand-in for one chunk's model work (single-threaded FFTs over a 30 s window)."""
+    x = np.random.default_rng(0).standard_normal(SAMPLE_RATE * 30).astype(np.float32)
+    for _ in range(FFT_ROUNDS):
+        np.fft.rfft(x)
+
+
+def stage_scaling(args, work: Path) -> Dict[str, Any]:
+    from sonify.utils.resources import scheduler
+
+    budget = len(scheduler.cores())
+    chunks = max(2 * budget, int(args.seconds // 30))
+    # 2 × budget: more workers than cores, i.e. what oversubscription costs
+    counts = sorted({1, budget, 2 * budget, *(n for n in (2, 4, 8, 16, 32) if n < budget)})
+    out: Dict[str, Any] = {"cores": budget, "chunks": chunks}
+    for pin in (False, True) if hasattr(os, "sched_setaffinity") else (False,):
+        scheduler.configure(pin=pin)
+        rows = {}
+        for workers in counts:
+            with scheduler.pool(workers) as pool:
+                list(pool.map(_warm, range(workers)))  # start every worker (and claim its cores) first
+                times = timed(lambda: list(pool.map(_model_chunk, range(chunks))), args.repeat)
+            rate = chunks / float(np.median(times))
+            rows[workers] = {"chunks_per_s": round(rate, 2)}
+        base = rows[1]["chunks_per_s"]
+        for row in rows.values():
+            row["speedup"] = round(row["chunks_per_s"] / base, 2)
+        out["pinned" if pin else "unpinned"] = rows
+    return out
+
+
+def stage_cli_startup(args, work: Path) -> Dict[str, Any]:
+    env = dict(os.environ)
+    commands = {
+        "import": [sys.executable, "-c", "import sonify.cli"],
+        "help": [sys.executable, "-c", "import sys; sys.argv = ['sonify', '--help']; "
+                                       "from sonify.cli import main; main()"],
+    }
+    out: Dict[str, Any] = {}
+    for name, cmd in commands.items():
+        times = timed(lambda: subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL), args.repeat)
+        out[name] = latency(times)
+    out["child_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return out
+
+
+STAGES = {
+    "cached_wav": stage_cached_wav,
+    "hashing": stage_hashing,
+    "chunking": stage_chunking,
+    "stream": stage_stream,
+    "cache_io": stage_cache_io,
+    "alignment": stage_alignment,
+    "scaling": stage_scaling,
+    "cli_startup": stage_cli_startup,
+}
+
+
+# -----------------------------------------------------------------------------
+# Driver
+# -----------------------------------------------------------------------------
+
+def run_child(stage: str, args) -> Dict[str, Any]:
+    """Run one stage in a fresh interpreter with its own empty cache."""
+    with tempfile.TemporaryDirectory(prefix=f"sonify-bench-{stage}-") as tmp:
+        env = dict(os.environ, SONIFY_CACHE_DIR=str(Path(tmp) / "cache"), SONIFY_CACHE_BUDGET="0")
+        cmd = [sys.executable, __file__, "--child", stage, "--workdir", tmp,
+               "--seconds", str(args.seconds), "--repeat", str(args.repeat)]
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--stage", action="append", choices=sorted(STAGES), help="Run only these stages (repeatable)")
+    parser.add_argument("--seconds", type=float, default=600.0, help="Length of the synthetic audio")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Also write the report to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        t0 = time.perf_counter()
+        result = STAGES[args.child](args, Path(args.workdir))
+        result["wall_seconds"] = round(time.perf_counter() - t0, 3)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "audio_seconds": args.seconds,
+            "repeat": args.repeat,
+        },
+        "stages": {stage: run_child(stage, args) for stage in (args.stage or STAGES)},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
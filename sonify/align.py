@@ -0,0 +1,76 @@
+import heapq
+from typing import Dict, List, Sequence, Tuple
+
+Turn = Tuple[str, float, float]  # (speaker, start, end)
+
+
+def assign_intervals(turns: Sequence[Turn], intervals: Sequence[Tuple[float, float]]) -> List[int]:
+    """
+    Index of the turn each interval overlaps most, or -1 if it overlaps none.
+
+    Single sweep over both lists sorted by start: turns enter an active heap
+    once they start before the interval ends and leave it once they end
+    before the interval starts, so each interval only inspects the turns that
+    actually overlap it. O((T + N) log T) instead of O(T × N).
+    """
+    t_order = sorted(range(len(turns)), key=lambda i: turns[i][1])
+    i_order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    result = [-1] * len(intervals)
+    active: List[Tuple[float, int]] = []  # (turn end, turn index)
+    nxt = 0
+
+    for idx in i_order:
+        start, end = intervals[idx]
+        while nxt < len(t_order) and turns[t_order[nxt]][1] < end:
+            ti = t_order[nxt]
+            heapq.heappush(active, (turns[ti][2], ti))
+            nxt += 1
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        best, best_overlap = -1, 0.0
+        for turn_end, ti in active:
+            overlap = min(end, turn_end) - max(start, turns[ti][1])
+            # ties go to the earlier turn, matching the old first-come rule
+            if overlap > best_overlap or (overlap == best_overlap and overlap > 0 and ti < best):
+                best, best_overlap = ti, overlap
+        if best < 0 and end <= start:
+            # zero-length interval (e.g. a word without duration): containment
+            for turn_end, ti in active:
+                if turns[ti][1] <= start <= turn_end:
+                    best = ti if best < 0 else min(best, ti)
+        result[idx] = best
+    return result
+
+
+def align_segments(turns: Sequence[Turn], segments: List[Dict], use_words: bool = False) -> List[Dict]:
+    """
+    Attach transcript text to speaker turns by maximum temporal overlap.
+
+    Returns one {"speaker", "start", "end", "text"} dict per turn that
+    received text, in turn order. With `use_words`, segments carrying
+    Whisper word timestamps are split word by word, so a segment spanning a
+    speaker change is divided between both speakers.
+    """
+    pieces: List[Tuple[float, float, str]] = []
+    for seg in segments:
+        words = seg.get("words") if use_words else None
+        if words:
+            pieces.extend((w["start"], w["end"], w["word"]) for w in words)
+        else:
+            pieces.append((seg["start"], seg["end"], " " + seg["text"].strip()))
+
+    owners = assign_intervals(turns, [(s, e) for s, e, _ in pieces])
+    texts: Dict[int, List[str]] = {}
+    for (_, _, text), ti in zip(pieces, owners):
+        if ti >= 0:
+            texts.setdefault(ti, []).append(text)
+
+    aligned = []
+    for ti in sorted(texts, key=lambda i: (turns[i][1], i)):
+        text = " ".join("".join(texts[ti]).split())
+        if not text:
+            continue
+        speaker, start, end = turns[ti]
+        aligned.append({"speaker": speaker, "start": start, "end": end, "text": text})
+    return aligned
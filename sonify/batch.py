@@ -0,0 +1,203 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+from .utils.metrics import metrics
+from .utils.resources import scheduler
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SUFFIXES = {".mp3", ".wav", ".m4a", ".flac", ".aac", ".opus", ".ogg", ".webm", ".mp4", ".wma"}
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """
+    Resolve CLI inputs to a de-duplicated, ordered list of audio files.
+
+    Each entry may be a file, a directory (searched recursively for known
+    audio suffixes) or a glob pattern (`**` supported).
+    """
+    files: List[str] = []
+    seen = set()
+
+    def add(p: Path):
+        key = str(p.resolve())
+        if key not in seen:
+            seen.add(key)
+            files.append(str(p))
+
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            for p in sorted(path.rglob("*")):
+                if p.is_file() and p.suffix.lower() in AUDIO_SUFFIXES:
+                    add(p)
+        elif path.is_file():
+            add(path)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                logger.warning(f"No input matches {pattern}")
+            for m in matches:
+                if Path(m).is_file():
+                    add(Path(m))
+    return files
+
+
+def _input_base(pattern: str) -> Path | None:
+    """Directory an input searches under: the directory itself, or a glob's non-wildcard prefix."""
+    path = Path(pattern)
+    if path.is_dir():
+        return path
+    if not glob.has_magic(pattern):
+        return None  # a plain file
+    prefix = []
+    for part in path.parts:
+        if glob.has_magic(part):
+            break
+        prefix.append(part)
+    return Path(*prefix) if prefix else Path(".")
+
+
+def output_names(files: List[str], patterns: Iterable[str]) -> Dict[str, str]:
+    """
+    Output name (without suffix) for each file: its path relative to the
+    directory or glob base it was found under, so `in/a/x.mp3` and
+    `in/b/x.mp3` write `a/x.*` and `b/x.*`. Plain file inputs use their
+    stem. Names that still collide (e.g. the same relative path under two
+    input directories) get a short digest of the resolved path appended.
+    """
+    bases = [b.resolve() for b in map(_input_base, patterns) if b is not None]
+    names: Dict[str, str] = {}
+    for f in files:
+        real = Path(f).resolve()
+        name = Path(f).stem
+        for base in bases:
+            if real.is_relative_to(base):
+                name = real.relative_to(base).with_suffix("").as_posix()
+                break
+        names[f] = name
+    taken: Dict[str, int] = {}
+    for name in names.values():
+        taken[name] = taken.get(name, 0) + 1
+    for f, name in names.items():
+        if taken[name] > 1:
+            names[f] = f"{name}-{hashlib.sha256(str(Path(f).resolve()).encode()).hexdigest()[:8]}"
+    return names
+
+
+class Manifest:
+    """
+    Append-only JSONL record of per-file job status.
+
+    Every state change is appended and fsynced, so a crash or Ctrl-C loses at
+    most the file that was in flight; the last record per path wins on load.
+    Files are keyed by resolved path, so `x.mp3` and `./x.mp3` are one entry
+    and equally named files in different directories are not.
+    """
+
+    FINISHED = ("done", "skipped")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        state: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return state
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line after a crash
+                state[self.key(rec["path"])] = rec
+        return state
+
+    @staticmethod
+    def key(path: str) -> str:
+        return os.path.realpath(path)
+
+    def record(self, path: str, status: str, **fields):
+        rec = {"path": self.key(path), "status": status, "time": time.time(), **fields}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _timed(process: Callable[[str], str], path: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        status = process(path)
+        return {"status": status, "seconds": round(time.perf_counter() - t0, 3)}
+    except Exception as exc:
+        logger.exception(f"Failed: {path}")
+        return {"status": "failed", "seconds": round(time.perf_counter() - t0, 3), "error": repr(exc)}
+
+
+def _timed_in_worker(process: Callable[[str], str], path: str) -> Dict[str, Any]:
+    # ship this file's stage metrics back to the parent with the outcome
+    metrics.reset()
+    outcome = _timed(process, path)
+    outcome["_metrics"] = metrics.snapshot()
+    return outcome
+
+
+def run_batch(
+        files: List[str],
+        process: Callable[[str], str],
+        manifest: Manifest,
+        jobs: int = 1,
+        resume: bool = True,
+        initializer: Callable | None = None,
+        initargs: tuple = (),
+) -> Dict[str, int]:
+    """
+    Run `process(path) -> status` over `files`, recording each in `manifest`.
+
+    Files whose last manifest status is done/skipped are not re-run when
+    `resume` is set. With `jobs > 1`, files are processed by a pool of worker
+    processes (`process` must then be picklable) with an equal share of the
+    CPU cores (see `sonify.utils.resources`); each worker keeps its
+    models warm across the files it handles.
+    """
+    state = manifest.load() if resume else {}
+    todo = [f for f in files if state.get(Manifest.key(f), {}).get("status") not in Manifest.FINISHED]
+    counts = {"total": len(files), "resumed": len(files) - len(todo), "done": 0, "skipped": 0, "failed": 0}
+    if counts["resumed"]:
+        logger.info(f"Resuming: {counts['resumed']} of {len(files)} files already finished")
+
+    def finish(path: str, outcome: Dict[str, Any]):
+        metrics.merge(outcome.pop("_metrics", {}))
+        manifest.record(path, **outcome)
+        counts[outcome["status"]] += 1
+        n = counts["done"] + counts["skipped"] + counts["failed"]
+        logger.info(f"[{n}/{len(todo)}] {outcome['status']}: {path} ({outcome['seconds']:.1f}s)")
+
+    if jobs <= 1 or len(todo) <= 1:
+        if initializer:
+            initializer(*initargs)
+        for path in todo:
+            manifest.record(path, "running")
+            finish(path, _timed(process, path))
+        return counts
+
+    pool = scheduler.pool(min(jobs, len(todo)), initializer, initargs)
+    try:
+        futures = {pool.submit(_timed_in_worker, process, path): path for path in todo}
+        for fut in as_completed(futures):
+            finish(futures[fut], fut.result())
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; finished files are recorded in the manifest, rerun to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return counts
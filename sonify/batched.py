@@ -0,0 +1,108 @@
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Whisper decodes 30 s windows; timestamp tokens advance in 20 ms steps
+WINDOW_SAMPLES = 30 * 16000
+TIME_PRECISION = 0.02
+
+# Same quality gates whisper.transcribe uses to trigger temperature fallback
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def _needs_fallback(res) -> bool:
+    if res.no_speech_prob > NO_SPEECH_THRESHOLD and res.avg_logprob < LOGPROB_THRESHOLD:
+        return False  # silent window, will be dropped
+    return res.compression_ratio > COMPRESSION_RATIO_THRESHOLD or res.avg_logprob < LOGPROB_THRESHOLD
+
+
+def _split_segments(res, tokenizer, duration: float) -> List[Dict[str, Any]]:
+    """Turn the timestamped token stream of one DecodingResult into segments."""
+    ts_begin = tokenizer.timestamp_begin
+    segments, text_tokens, start = [], [], None
+
+    def emit(end: float):
+        segments.append({
+            "id": len(segments),
+            "seek": 0,
+            "start": start or 0.0,
+            "end": min(max(end, start or 0.0), duration),
+            "text": tokenizer.decode(text_tokens),
+            "tokens": list(text_tokens),
+            "temperature": res.temperature,
+            "avg_logprob": res.avg_logprob,
+            "compression_ratio": res.compression_ratio,
+            "no_speech_prob": res.no_speech_prob,
+        })
+
+    # <|t0|> text <|t1|><|t1|> text <|t2|> …
+    for tok in res.tokens:
+        if tok >= ts_begin:
+            t = (tok - ts_begin) * TIME_PRECISION
+            if text_tokens:
+                emit(t)
+                text_tokens, start = [], None
+            else:
+                start = t
+        else:
+            text_tokens.append(tok)
+    if text_tokens:
+        emit(duration)
+    return segments
+
+
+def transcribe_batch(model, windows: List[np.ndarray], language: str) -> List[Dict[str, Any] | None]:
+    """
+    Decode several ≤30 s float32 windows with one encoder pass.
+
+    The log-mel spectrograms are stacked into a (K, n_mels, 3000) batch and
+    handed to `model.decode`, which runs the encoder once and decodes all K
+    sequences together. Returns one `model.transcribe`-shaped dict per
+    window, or None where the greedy pass failed Whisper's quality gates and
+    the caller should fall back to the regular temperature-fallback path.
+    """
+    import torch
+    from whisper.audio import log_mel_spectrogram, pad_or_trim
+    from whisper.decoding import DecodingOptions
+    from whisper.tokenizer import get_tokenizer
+
+    if any(len(w) > WINDOW_SAMPLES for w in windows):
+        raise ValueError("Batched decoding requires windows of at most 30 s")
+
+    mel = torch.stack([
+        log_mel_spectrogram(pad_or_trim(torch.from_numpy(w)), model.dims.n_mels)
+        for w in windows
+    ]).to(model.device)
+    options = DecodingOptions(
+        language=None if language == "auto" else language,
+        fp16=False,
+        without_timestamps=False,
+    )
+    with torch.no_grad():
+        decoded = model.decode(mel, options)
+
+    out = []
+    for w, res in zip(windows, decoded):
+        if _needs_fallback(res):
+            out.append(None)
+            continue
+        tokenizer = get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=res.language,
+            task="transcribe",
+        )
+        silent = res.no_speech_prob > NO_SPEECH_THRESHOLD and res.avg_logprob < LOGPROB_THRESHOLD
+        segments = [] if silent else _split_segments(res, tokenizer, len(w) / 16000)
+        out.append({
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": res.language,
+        })
+    logger.debug(f"Batched decode of {len(windows)} windows, {out.count(None)} need fallback")
+    return out
@@ -1,9 +1,20 @@
 import argparse
+import json
 import logging
+import sys
 from pathlib import Path
+from typing import Dict
 from .transcribe import transcribe_with_cache
-from .diarize import diarize_audio
+from .pipeline import DEFAULT_DIARIZE_SHARE, transcribe_and_diarize
+from .utils.models import whisper_models
+from .utils.cache import parse_size, store
+from .utils.metrics import metrics
+from .utils.profiling import MODES as PROFILE_MODES, profiler
+from .utils.resources import scheduler
+from .batch import Manifest, expand_inputs, output_names, run_batch
+from contextlib import nullcontext
 from datetime import timedelta
+from functools import partial
 
 
 def format_segments(segments):
@@ -20,28 +31,16 @@ def format_segments(segments):
     return "\n".join(lines)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Whisper transcription with caching, optional diarization, and controlled logging"
-    )
-    parser.add_argument("audio", help="Audio file path")
-    parser.add_argument("-m", "--model", default="medium", help="Whisper model size")
-    parser.add_argument("-l", "--lang", default="de", help="Language code")
-    parser.add_argument("-hft", "--hf_token", help="HuggingFace token for diarization")
-    parser.add_argument("-O", "--out_dir", default="output", help="Output directory for transcript and diarization files")
-    parser.add_argument("-f", "--force", action="store_true", help="Force refresh of outputs")
-    parser.add_argument("-c", "--chunk_size", type=int, help="Split audio into chunks of given length (seconds) for per-chunk caching")
-    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose debug logging for sonify modules and print segments")
-    args = parser.parse_args()
-
+def _configure_logging(verbose: bool):
     # Configure root logger with filter to allow only sonify logs
     root = logging.getLogger()
     root.handlers.clear()
-    level = logging.DEBUG if args.verbose else logging.INFO
+    level = logging.DEBUG if verbose else logging.INFO
     root.setLevel(level)
     handler = logging.StreamHandler()
     handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
-    allowed_prefixes = ('sonify.transcribe', 'sonify.diarize', __name__)
+    allowed_prefixes = ('sonify.transcribe', 'sonify.diarize', 'sonify.pipeline', 'sonify.batch', 'sonify.live',
+                        'sonify.utils', __name__)
 
     class ModuleFilter(logging.Filter):
         def filter(self, record):
@@ -49,11 +48,36 @@ def main():
 
     handler.addFilter(ModuleFilter())
     root.addHandler(handler)
+
+
+def _init_job(verbose: bool, model_budget: int | None, metric_events: bool = False):
+    """Per-process setup, also used as the batch worker initializer."""
+    _configure_logging(verbose)
+    if model_budget is not None:
+        whisper_models.set_budget(model_budget << 20)
+    if metric_events:
+        metrics.enable_events()
+
+
+def _report_metrics(prom_file: str | None):
+    logger = logging.getLogger(__name__)
+    logger.info(json.dumps({"event": "summary", **metrics.summary()}))
+    if prom_file:
+        metrics.write_prometheus(prom_file)
+        logger.info(f"Metrics written to {prom_file}")
+
+
+def process_file(audio: str, args: argparse.Namespace, names: Dict[str, str] | None = None) -> str:
+    """
+    Transcribe (and optionally diarize) one file; returns 'done' or 'skipped'.
+    Outputs are named `<name>.*` under the output directory, where `names`
+    (see `output_names`) maps inputs to collision-free names; default: the stem.
+    """
     logger = logging.getLogger(__name__)
 
-    stem = Path(args.audio).stem
+    stem = (names or {}).get(audio) or Path(audio).stem
     out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / stem).parent.mkdir(parents=True, exist_ok=True)
     transcript_path = out_dir / f"{stem}.transcript.txt"
     segments_path = out_dir / f"{stem}.segments.txt"
     diar_path = out_dir / f"{stem}.diarized.txt"
@@ -82,17 +106,30 @@ def main():
                 print(segments_path.read_text())
             except Exception:
                 pass
-        return
+        return "skipped"
 
-    # Transcription
-    result = transcribe_with_cache(
-        args.audio, args.model, args.lang,
-        force=args.force, chunk_size=args.chunk_size
+    # Transcription, with diarization running alongside when it is needed
+    run_diar = bool(args.hf_token) and (args.force or not diar_path.exists())
+    if args.hf_token and not run_diar:
+        logger.info(f"Skipping diarization: file exists at {diar_path}")
+    options = dict(
+        force=args.force, chunk_size=args.chunk_size, workers=args.workers,
+        vad=args.vad, batch_size=args.batch_size,
+        fields=("start", "end", "text", "words"),  # all the outputs and alignment use
     )
+    if run_diar:
+        logger.info(f"Starting transcription and diarization for {audio}")
+        result, diar = transcribe_and_diarize(
+            audio, args.model, args.lang, args.hf_token,
+            diarize_share=args.diar_share, **options
+        )
+    else:
+        result, diar = transcribe_with_cache(audio, args.model, args.lang, **options), None
 
     # Write full transcript
     transcript_path.write_text(result.get("text", "").strip(), encoding="utf-8")
     logger.info(f"Transcript saved to {transcript_path}")
+    logger.debug(f"Whisper model registry: {whisper_models.stats()}")
 
     # Always write transcript segments to file
     segments = result.get("segments", []) or []
@@ -105,12 +142,7 @@ def main():
         print(segments_str)
 
     # Diarization
-    if args.hf_token:
-        if not args.force and diar_path.exists():
-            logger.info(f"Skipping diarization: file exists at {diar_path}")
-            return
-        logger.info(f"Starting diarization for {args.audio}")
-        diar = diarize_audio(args.audio, segments, args.hf_token)
+    if diar is not None:
         logger.debug(f"Diarization returned {len(diar)} segments")
         with open(diar_path, 'w', encoding='utf-8') as f:
             for item in diar:
@@ -118,3 +150,146 @@ def main():
                 e = timedelta(seconds=int(item['end']))
                 f.write(f"{item['speaker']} [{s}-{e}]: {item['text']}\n")
         logger.info(f"Diarized transcript saved to {diar_path}")
+    return "done"
+
+
+def stream_main(args: argparse.Namespace):
+    """Live mode: transcribe one stream as it arrives, printing finalized segments as JSONL."""
+    from .live import live_transcribe
+
+    for seg in live_transcribe(args.audio[0], args.model, args.lang, raw=args.raw, step=args.step):
+        print(json.dumps(seg, ensure_ascii=False), flush=True)
+
+
+def cache_main(argv: list):
+    """`sonify cache stats|prune|verify` – inspect and maintain the cache via its index."""
+    parser = argparse.ArgumentParser(prog="sonify cache", description="Inspect and maintain the sonify cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Size, entry count and hit rate per artifact type")
+    prune = sub.add_parser("prune", help="Evict least-recently-used or old artifacts")
+    prune.add_argument("--budget", help="Evict until the cache fits, e.g. 10G (default: SONIFY_CACHE_BUDGET)")
+    prune.add_argument("--max_age", type=float, help="Also evict artifacts not used for this many days")
+    prune.add_argument("--kind", help="Only consider one artifact type (wav, results, chunks, turns, …); "
+                            "uploads are only pruned when named here")
+    verify = sub.add_parser("verify", help="Drop index entries whose files are missing or damaged")
+    verify.add_argument("--deep", action="store_true", help="Also parse JSON artifacts")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        stats = store.stats()
+        print(f"{'kind':<10} {'entries':>8} {'size':>10} {'hits':>7} {'misses':>7} {'hit rate':>8}")
+        for kind, e in sorted(stats.items()):
+            rate = "-" if e["hit_rate"] is None else f"{e['hit_rate']:.0%}"
+            print(f"{kind:<10} {e['count']:>8} {e['bytes'] / (1 << 20):>8.1f}MB "
+                  f"{e['hits']:>7} {e['misses']:>7} {rate:>8}")
+        budget = f"{store.budget / (1 << 30):.1f} GB" if store.budget else "unlimited"
+        print(f"total {store.total_bytes() / (1 << 20):.1f} MB of {budget} in {store.root}")
+    elif args.command == "prune":
+        budget = parse_size(args.budget) if args.budget else store.budget or None
+        max_age = args.max_age * 86400 if args.max_age is not None else None
+        removed, freed = store.evict(budget, max_age, kind=args.kind)
+        print(f"Removed {removed} artifacts, freed {freed / (1 << 20):.1f} MB")
+    elif args.command == "verify":
+        report = store.verify(deep=args.deep)
+        print(", ".join(f"{k}: {v}" for k, v in report.items()))
+
+
+def main():
+    if sys.argv[1:2] == ["cache"]:
+        return cache_main(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(
+        description="Whisper transcription with caching, optional diarization, and controlled logging"
+    )
+    parser.add_argument("audio", nargs="+", help="Audio file paths, directories or glob patterns")
+    parser.add_argument("-m", "--model", default="medium", help="Whisper model size")
+    parser.add_argument("-l", "--lang", default="de", help="Language code")
+    parser.add_argument("-hft", "--hf_token", help="HuggingFace token for diarization")
+    parser.add_argument("-O", "--out_dir", default="output", help="Output directory for transcript and diarization files")
+    parser.add_argument("-f", "--force", action="store_true", help="Force refresh of outputs")
+    parser.add_argument("-c", "--chunk_size", type=int, help="Split audio into chunks of given length (seconds) for per-chunk caching")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Transcribe chunks in N worker processes (implies --chunk_size 30 if unset)")
+    parser.add_argument("-b", "--batch_size", type=int, default=1, help="Decode N chunks (≤30 s) per encoder pass")
+    parser.add_argument("--vad", action="store_true", help="Cut chunks in silence and skip silent stretches (implies --chunk_size 30 if unset)")
+    parser.add_argument("--diar_share", type=float, default=DEFAULT_DIARIZE_SHARE,
+                        help="Share of the CPU cores given to diarization while it runs alongside transcription")
+    parser.add_argument("--model_budget", type=int, help="RAM budget in MB for resident Whisper models (0 = unlimited)")
+    parser.add_argument("--cpus", type=int,
+                        help="CPU cores sonify may use (default: all); split between workers, jobs and diarization")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker process to its cores (CPU affinity)")
+    parser.add_argument("--interop_threads", type=int, help="torch inter-op threads per process (default: 1)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Process N files in parallel worker processes")
+    parser.add_argument("--manifest", help="JSONL job manifest for multi-file runs (default: <out_dir>/sonify-manifest.jsonl)")
+    parser.add_argument("--no_resume", action="store_true", help="Ignore finished entries in the manifest and process every file")
+    parser.add_argument("--stream", action="store_true",
+                        help="Live mode: read one stream ('-' for stdin, or a named pipe/URL) and print finalized segments as JSONL")
+    parser.add_argument("--raw", action="store_true", help="With --stream: input is already 16 kHz mono s16le PCM (skip ffmpeg)")
+    parser.add_argument("--step", type=float, default=5.0, help="With --stream: seconds of new audio between transcription passes")
+    parser.add_argument("--metrics", action="store_true", help="Log per-stage JSON metrics events and a summary")
+    parser.add_argument("--metrics_file", metavar="PATH",
+                        help="Also write the metrics as a Prometheus textfile to PATH (implies --metrics)")
+    parser.add_argument("--profile", action="store_true", help="Profile pipeline stages into <out_dir>/profile")
+    parser.add_argument("--profile_mode", choices=PROFILE_MODES,
+                        help="cpu (default): flame-graph stacks + cProfile; torch: operator table; all: both "
+                             "(implies --profile)")
+    parser.add_argument("--profile_stage", action="append", metavar="STAGE",
+                        help="Only profile these stages (convert, chunking, model_load, transcribe, transcribe_batch, "
+                             "diarize, align), or 'run' for the whole invocation; repeatable")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose debug logging for sonify modules and print segments")
+    args = parser.parse_args()
+    args.metrics = args.metrics or args.metrics_file is not None
+    args.profile = args.profile or args.profile_mode is not None
+
+    _init_job(args.verbose, args.model_budget, args.metrics)
+    # before any model loads; workers inherit the policy and take their share
+    scheduler.configure(args.cpus, args.pin or None, args.interop_threads)
+    scheduler.apply(scheduler.cores())
+    logging.getLogger(__name__).debug(f"CPU budget: {scheduler.describe()}")
+    if args.profile:
+        profiler.configure(args.profile_mode or "cpu", Path(args.out_dir) / "profile", args.profile_stage)
+    whole_run = args.profile and "run" in (args.profile_stage or ())
+    try:
+        with profiler.profile("run") if whole_run else nullcontext():
+            _run(args, parser)
+    finally:
+        if args.metrics:
+            _report_metrics(args.metrics_file)
+
+
+def _run(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    logger = logging.getLogger(__name__)
+
+    if args.stream:
+        if len(args.audio) != 1:
+            parser.error("--stream takes exactly one source")
+        return stream_main(args)
+
+    if (args.workers > 1 or args.vad or args.batch_size > 1) and not args.chunk_size:
+        args.chunk_size = 30
+
+    files = expand_inputs(args.audio)
+    if not files:
+        parser.error("no audio files found")
+
+    # Single file without an explicit manifest: plain run, as before
+    if len(files) == 1 and not args.manifest:
+        process_file(files[0], args, output_names(files, args.audio))
+        return
+
+    manifest = Manifest(Path(args.manifest or Path(args.out_dir) / "sonify-manifest.jsonl"))
+    logger.info(f"Processing {len(files)} files with {args.jobs} job(s); manifest at {manifest.path}")
+    counts = run_batch(
+        files,
+        partial(process_file, args=args, names=output_names(files, args.audio)),
+        manifest,
+        jobs=args.jobs,
+        resume=not args.no_resume,
+        initializer=_init_job,
+        initargs=(args.verbose, args.model_budget, args.metrics),
+    )
+    logger.info(
+        f"Batch finished: {counts['done']} done, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed, {counts['resumed']} already finished"
+    )
+    if counts["failed"]:
+        raise SystemExit(1)
@@ -1,13 +1,11 @@
-import json
-import hashlib
 import logging
 from typing import List, Dict
-import torch
-from pyannote.audio.models.blocks.pooling import StatsPool
-from pyannote.audio.pipelines.utils.hook import ProgressHook
-from pyannote.audio import Pipeline
 from .transcribe import cached_wav  # ← import at the top of the file
-from sonify.utils.cache import generate_file_id
+from .align import align_segments
+from sonify.utils.audio import wav_info
+from sonify.utils.cache import params_key, store
+from sonify.utils.metrics import metrics
+from sonify.utils.models import DIARIZATION_MODEL, diarization_pipeline
 from pathlib import Path
 
 
@@ -37,50 +35,93 @@ class StreamlitHook:
         self.callback(step_name, completed, total)
 
 
-# Patch StatsPool for Pyannote
-def patched_forward(self, sequences, weights=None):
-    mean = sequences.mean(dim=-1)
-    if sequences.size(-1) > 1:
-        std = sequences.std(dim=-1, correction=1)
-    else:
-        std = torch.zeros_like(mean)
-    return torch.cat([mean, std], dim=-1)
+def _turns_cache_key(wav_path: str, model_id: str, params: Dict) -> str:
+    """
+    Key raw diarization by audio content + pipeline settings only.
+
+    `cached_wav` names each WAV after the content digest of its source, so
+    the stem is already a digest and nothing needs to be re-read here.
+    """
+    return params_key(Path(wav_path).stem, model_id=model_id, **params)
+
+
+def load_cached_raw_turns(key: str) -> Dict | None:
+    return store.read_json("turns", key)
 
 
-StatsPool.forward = patched_forward
+def save_cached_raw_turns(key: str, diar: Dict):
+    store.write_json("turns", key, diar)
 
-# Cache directory
-DIAR_CACHE_DIR = Path.home() / ".cache" / "sonify" / "diar"
-DIAR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+def _pipeline_params(num_speakers=None, min_speakers=None, max_speakers=None) -> Dict:
+    return {k: v for k, v in (("num_speakers", num_speakers), ("min_speakers", min_speakers),
+                              ("max_speakers", max_speakers)) if v is not None}
 
-def _diar_cache_key(file_id: str, segments: list) -> str:
-    m = hashlib.md5()
-    m.update(file_id.encode("utf-8"))
-    seg_json = json.dumps(
-        sorted(segments, key=lambda s: (s["start"], s["end"], s["text"])),
-        ensure_ascii=False,
-        separators=(",", ":"),
-    )
-    m.update(seg_json.encode("utf-8"))
-    return m.hexdigest()
 
+def cached_turns(src: str, model_id: str = DIARIZATION_MODEL, **speaker_params) -> Dict | None:
+    """Raw diarization of `src` if it is already cached, without loading pyannote."""
+    key = _turns_cache_key(cached_wav(src), model_id, _pipeline_params(**speaker_params))
+    return load_cached_raw_turns(key)
 
-def load_cached_diar(file_id: str, segments: list) -> List[Dict]:
-    key = _diar_cache_key(file_id, segments)
-    fpth = DIAR_CACHE_DIR / f"{key}.json"
-    if fpth.exists():
-        try:
-            return json.loads(fpth.read_text(encoding="utf-8"))
-        except:
-            fpth.unlink()
-    return []
 
+def diarize_turns(
+        src: str,
+        hf_token: str,
+        progress_callback: callable = None,
+        model_id: str = DIARIZATION_MODEL,
+        num_speakers: int | None = None,
+        min_speakers: int | None = None,
+        max_speakers: int | None = None,
+) -> Dict:
+    """
+    Run (or load) raw speaker diarization for `src`.
+
+    Returns {"turns": [{"speaker", "start", "end"}], "speakers": [...],
+    "embeddings": [[...], ...]} with one embedding per entry of "speakers".
+    Cached by audio content and pipeline parameters only, so changing the
+    Whisper model or language never re-runs pyannote.
+    """
+    wav_path = cached_wav(src)
+    params = _pipeline_params(num_speakers, min_speakers, max_speakers)
+    key = _turns_cache_key(wav_path, model_id, params)
+    cached = load_cached_raw_turns(key)
+    if cached is not None:
+        logging.info("Loaded diarization from cache.")
+        return cached
 
-def save_cached_diar(file_id: str, segments: list, turns: list):
-    key = _diar_cache_key(file_id, segments)
-    fpth = DIAR_CACHE_DIR / f"{key}.json"
-    fpth.write_text(json.dumps(turns, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Single-flight: a concurrent caller for the same audio waits here and
+    # then picks up the published turns instead of running pyannote again.
+    with store.locked("turns", key):
+        cached = store.peek_json("turns", key)
+        if cached is not None:
+            logging.info("Loaded diarization from cache.")
+            return cached
+        # Get the warm pipeline (loaded once per process), reserved while it runs
+        # If a callback is provided, wrap it in our hook
+        with diarization_pipeline(hf_token, model_id) as pipeline, \
+                metrics.stage("diarize", wav_info(wav_path).duration):
+            if progress_callback:
+                hook = StreamlitHook(progress_callback)
+                with hook as h:
+                    print("diarizing...")
+                    diar, embeddings = pipeline(wav_path, hook=h, return_embeddings=True, **params)
+            else:
+                # no callback — just run normally
+                from pyannote.audio.pipelines.utils.hook import ProgressHook
+                with ProgressHook() as hook:
+                    diar, embeddings = pipeline(wav_path, hook=hook, return_embeddings=True, **params)
+
+        result = {
+            "turns": [
+                {"speaker": speaker, "start": turn.start, "end": turn.end}
+                for turn, _, speaker in diar.itertracks(yield_label=True)
+            ],
+            "speakers": list(diar.labels()),
+            "embeddings": [] if embeddings is None else embeddings.tolist(),
+        }
+        save_cached_raw_turns(key, result)
+        logging.info(f"Saved {len(result['turns'])} raw diarization turns to cache.")
+    return result
 
 
 def diarize_audio(
@@ -90,64 +131,15 @@ def diarize_audio(
         progress_callback: callable = None
 ) -> List[Dict]:
     """
-    Run (or load) speaker diarization, align with segments, and cache results.
+    Run (or load) speaker diarization and align it with `segments`.
 
+    Only the raw turns are cached (see `diarize_turns`); alignment is a cheap
+    sweep recomputed on every call.
     progress_callback: optional fn(str) to receive tqdm-style text.
     """
+    diar = diarize_turns(src, hf_token, progress_callback)
+    raw_turns = [(t["speaker"], t["start"], t["end"]) for t in diar["turns"]]
 
-    wav_path = cached_wav(src)
-    # 1) Prepare WAV & file_id
-    audio_bytes = Path(wav_path).read_bytes()
-    file_id = generate_file_id(audio_bytes, Path(wav_path).name)
-
-    # 2) Try cached diarization
-    cached = load_cached_diar(file_id, segments)
-    if cached:
-        logging.info("Loaded diarization from cache.")
-        return cached
-
-    # 3) Load pipeline
-    pipeline = Pipeline.from_pretrained(
-        "pyannote/speaker-diarization-3.1",
-        use_auth_token=hf_token
-    )
-
-    # If a callback is provided, wrap it in our hook
-    if progress_callback:
-        hook = StreamlitHook(progress_callback)
-        with hook as h:
-            print("diarizing...")
-            diar = pipeline(wav_path, hook=h)
-    else:
-        # no callback — just run normally
-        with ProgressHook() as hook:
-            diar = pipeline(wav_path, hook=hook)
-    # 5) Extract raw turns
-    raw_turns = [
-        (speaker, turn.start, turn.end)
-        for turn, _, speaker in diar.itertracks(yield_label=True)
-    ]
-
-    # 6) Align word-segments
-    aligned = []
-    used = set()
-    for speaker, start, end in raw_turns:
-        texts = []
-        for idx, seg in enumerate(segments):
-            if idx in used:
-                continue
-            if seg["start"] < end and seg["end"] > start:
-                texts.append(seg["text"].strip())
-                used.add(idx)
-        if texts:
-            aligned.append({
-                "speaker": speaker,
-                "start": start,
-                "end": end,
-                "text": " ".join(texts),
-            })
-
-    # 7) Cache & return
-    save_cached_diar(file_id, segments, aligned)
-    logging.info(f"Saved {len(aligned)} diarization turns to cache.")
-    return aligned
+    # Align segments to the turn they overlap most (single sweep)
+    with metrics.stage("align"):
+        return align_segments(raw_turns, segments, use_words=True)
@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .transcribe import transcribe_stream
+from .utils.cache import params_key, save_cached_segments
+from .utils.resources import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Transcription jobs running at once, shared by every Streamlit session
+MAX_JOBS = int(os.environ.get("SONIFY_UI_JOBS", "2"))
+# Finished jobs kept in memory for sessions that have not collected them yet
+KEEP_FINISHED = 8
+
+RUNNING, DONE, FAILED, CANCELLED = "running", "done", "failed", "cancelled"
+
+
+def job_key(file_id: str, model: str, language: str, chunk_size: int, vad: bool) -> str:
+    """Jobs are identified by audio content + the parameters that shape the result."""
+    return params_key(file_id, model=model, language=language, chunk_size=chunk_size, vad=vad)
+
+
+class Job:
+    """
+    One background transcription. The page only reads from it: `segments`
+    grows in timeline order and the counters move as chunks finish.
+    """
+
+    def __init__(self, key: str, file_id: str, wav_path: str, model: str, language: str, options: Dict):
+        self.key = key
+        self.file_id = file_id
+        self.wav_path = wav_path
+        self.model = model
+        self.language = language
+        self.options = options
+        self.state = RUNNING
+        self.chunk_index = 0
+        self.total_chunks = 0
+        self.progress = 0.0
+        self.segments: List[Dict] = []
+        self.error: str | None = None
+        self.started = time.time()
+        self.finished: float | None = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.state == RUNNING
+
+    @property
+    def stopping(self) -> bool:
+        """Cancelled, but still finishing the chunk in flight."""
+        return self.active and self._cancel.is_set()
+
+    def cancel(self):
+        """Stop after the chunk (batch) currently being transcribed."""
+        self._cancel.set()
+
+
+class JobRunner:
+    """
+    Process-wide executor for transcription jobs.
+
+    Jobs run on a shared thread pool, so they outlive the script run (and
+    the browser tab) that started them. Submitting an already running or
+    finished job returns the existing one, which is how a reconnecting
+    session reattaches; a cancelled job that is still stopping is replaced
+    by a new one. Each running job's chunk workers get their own slice of
+    the CPU cores, so concurrent jobs do not oversubscribe them.
+
+    Finished jobs leave memory once their session has `collect()`ed them;
+    of the ones nobody collects (e.g. a closed tab), only the
+    `KEEP_FINISHED` most recent are kept. Their segments stay in the cache.
+    """
+
+    def __init__(self, max_jobs: int = MAX_JOBS):
+        self.max_jobs = max(1, max_jobs)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="sonify-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = list(range(self.max_jobs))
+
+    def submit(
+            self,
+            file_id: str,
+            wav_path: str,
+            model: str,
+            language: str,
+            chunk_size: int = 30,
+            vad: bool = False,
+            workers: int = 1,
+            batch_size: int = 1,
+    ) -> Job:
+        key = job_key(file_id, model, language, chunk_size, vad)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.state in (RUNNING, DONE) and not job.stopping:
+                return job
+            options = {"chunk_size": chunk_size, "vad": vad, "workers": workers, "batch_size": batch_size}
+            job = self._jobs[key] = Job(key, file_id, wav_path, model, language, options)
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, key: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def running(self, file_id: str) -> List[Job]:
+        """Jobs still transcribing `file_id` (with any settings), excluding cancelled ones."""
+        with self._lock:
+            return [j for j in self._jobs.values() if j.file_id == file_id and j.active and not j.stopping]
+
+    def collect(self, key: str) -> Job | None:
+        """Release a finished job whose result the caller has taken over."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.active:
+                return job
+            return self._jobs.pop(key)
+
+    def _trim(self):
+        with self._lock:
+            finished = [k for k, j in self._jobs.items() if not j.active]
+            for key in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+                del self._jobs[key]
+
+    def _run(self, job: Job):
+        with self._lock:
+            slot = self._slots.pop()
+        stream = transcribe_stream(
+            job.wav_path, job.model, job.language,
+            chunk_size=job.options["chunk_size"], workers=job.options["workers"],
+            vad=job.options["vad"], batch_size=job.options["batch_size"],
+            cores=scheduler.split(self.max_jobs)[slot],
+        )
+        try:
+            for u in stream:
+                job.segments.extend(u["segments"])
+                job.chunk_index, job.total_chunks, job.progress = u["chunk_index"], u["total_chunks"], u["progress"]
+                if job._cancel.is_set():
+                    job.state = CANCELLED
+                    break
+            else:
+                save_cached_segments(job.file_id, job.model, job.language, job.segments)
+                job.state = DONE
+        except Exception as exc:
+            logger.exception(f"Transcription job {job.key} failed")
+            job.state, job.error = FAILED, str(exc)
+        finally:
+            stream.close()  # drops queued chunks and releases chunk locks on cancel
+            with self._lock:
+                self._slots.append(slot)
+            job.finished = time.time()
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    self._jobs.move_to_end(job.key)
+            self._trim()
+
+
+runner = JobRunner()
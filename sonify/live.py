@@ -0,0 +1,131 @@
+import logging
+import subprocess
+import sys
+from typing import Any, BinaryIO, Dict, Generator, Iterator
+
+import numpy as np
+
+from .transcribe import _transcribe_simple
+from .utils.audio import SAMPLE_RATE, to_float32
+
+logger = logging.getLogger(__name__)
+
+# Seconds of new audio between transcription passes (latency floor)
+DEFAULT_STEP = 5.0
+# Longest stretch of uncommitted audio kept in memory (Whisper sees ≤ 30 s)
+DEFAULT_WINDOW = 30.0
+# Segments ending this close to the live edge may still change
+HOLDBACK = 2.0
+
+
+def _decoder(src: str) -> subprocess.Popen:
+    """ffmpeg turning any decodable stream (stdin, named pipe, URL) into 16 kHz mono s16le."""
+    return subprocess.Popen(
+        [
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0" if src == "-" else src,
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+        ],
+        stdin=sys.stdin.buffer if src == "-" else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+    )
+
+
+def _blocks(stream: BinaryIO, block_samples: int) -> Iterator[np.ndarray]:
+    """int16 blocks of up to `block_samples` until EOF (short reads pass through)."""
+    pending = b""
+    while True:
+        data = stream.read(block_samples * 2)
+        if not data:
+            break
+        data = pending + data
+        usable = len(data) & ~1  # never split a sample
+        pending = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype="<i2")
+
+
+def pcm_blocks(src: str | BinaryIO, raw: bool = False, step: float = DEFAULT_STEP) -> Iterator[np.ndarray]:
+    """
+    Yield int16 blocks (up to `step` seconds) of 16 kHz mono audio as it arrives.
+
+    `src` is "-" (stdin), a path / named pipe / URL, or an open binary
+    stream. With `raw`, the input already is 16 kHz mono s16le and is read
+    directly; otherwise ffmpeg decodes it on the fly.
+    """
+    block_samples = int(step * SAMPLE_RATE)
+    if raw:
+        if isinstance(src, str):
+            with (open(src, "rb") if src != "-" else sys.stdin.buffer) as f:
+                yield from _blocks(f, block_samples)
+        else:
+            yield from _blocks(src, block_samples)
+        return
+    proc = _decoder(src)
+    try:
+        yield from _blocks(proc.stdout, block_samples)
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.terminate()
+        proc.wait()
+
+
+def live_transcribe(
+        src: str | BinaryIO,
+        model_name: str = "medium",
+        language: str = "de",
+        raw: bool = False,
+        step: float = DEFAULT_STEP,
+        window: float = DEFAULT_WINDOW,
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Transcribe a live audio stream, yielding finalized segments in order.
+
+    Every `step` seconds of new audio, the uncommitted tail (at most
+    `window` seconds) is transcribed again. Segments that end more than
+    `HOLDBACK` seconds before the live edge are final: they are yielded with
+    absolute times and their audio is dropped. A full window without a safe
+    cut is committed up to its last segment boundary, so latency and memory
+    stay bounded by `window` + `step`.
+    """
+    window = min(window, DEFAULT_WINDOW)
+    buf = np.zeros(0, dtype="<i2")
+    offset = 0  # samples committed before buf[0]
+
+    def commit(segments, upto: int):
+        nonlocal buf, offset
+        base = offset / SAMPLE_RATE
+        for s in segments:
+            yield {"start": round(base + s["start"], 3), "end": round(base + s["end"], 3), "text": s["text"].strip()}
+        buf = buf[upto:]
+        offset += upto
+
+    step_samples = int(step * SAMPLE_RATE)
+    fresh = 0  # samples received since the last pass
+
+    for block in pcm_blocks(src, raw=raw, step=step):
+        buf = np.concatenate([buf, block])
+        fresh += len(block)
+        if fresh < step_samples:
+            continue
+        fresh = 0
+        res = _transcribe_simple(to_float32(buf), model_name, language)
+        segments = [s for s in res.get("segments", []) if s["text"].strip()]
+        horizon = len(buf) / SAMPLE_RATE - HOLDBACK
+        final = [s for s in segments if s["end"] <= horizon]
+        full = len(buf) >= window * SAMPLE_RATE
+
+        if full and not final:
+            # no safe cut inside a full window: commit all but the last segment
+            final = segments[:-1] or segments
+        if final:
+            upto = min(len(buf), int(final[-1]["end"] * SAMPLE_RATE))
+            yield from commit(final, upto)
+        elif full or not segments:
+            # silence (or nothing usable): keep only the holdback tail
+            keep = int(HOLDBACK * SAMPLE_RATE)
+            yield from commit([], max(0, len(buf) - keep))
+
+    if len(buf):
+        res = _transcribe_simple(to_float32(buf), model_name, language)
+        yield from commit([s for s in res.get("segments", []) if s["text"].strip()], len(buf))
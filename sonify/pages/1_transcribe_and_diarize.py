@@ -1,14 +1,17 @@
 import streamlit as st
 import json
-from sonify.transcribe import transcribe_stream, cached_wav
+from sonify.transcribe import cached_wav
 from sonify.diarize import diarize_audio
+from sonify.pipeline import start_diarization
+from sonify.jobs import DONE, FAILED, runner
 from datetime import timedelta
 import time
-import tempfile
 from pathlib import Path
-from typing import List, Dict
-from sonify.utils.session import reset_state, init_session
-from sonify.utils.cache import generate_file_id, save_cached_turns, load_cached_turns, load_cached_segments, save_cached_segments
+from typing import List, Dict, Tuple
+from sonify.utils.session import Upload, reset_state, init_session
+from sonify.utils.audio import probe
+from sonify.utils.metrics import metrics
+from sonify.utils.cache import save_cached_turns, load_cached_turns, load_cached_segments
 
 try:
     cfg = st.session_state.cfg
@@ -66,44 +69,126 @@ def format_hms(seconds: float) -> str:
     return f"{hrs:02d}:{mins:02d}:{secs:02d}"
 
 
-def show_transcript(segments: List[Dict]):
-    if not segments:
+# Long transcripts are shown one page of lines at a time
+PAGE_LINES = 200
+# Live view refreshes at most this many times per second
+UI_FPS = 4.0
+
+
+def segment_lines(s: Dict) -> Tuple[str, str]:
+    """(markdown, plain text) line for one segment."""
+    start = timedelta(seconds=int(s["start"]))
+    end = timedelta(seconds=int(s["end"]))
+    text = s["text"].strip()
+    return f"**[{start}–{end}]** {text}\n\n", f"[{start}–{end}] {text}\n\n"
+
+
+def transcript_lines() -> Tuple[List[str], List[str]]:
+    """
+    Preformatted (markdown, text) lines for `st.session_state.segments`.
+
+    Kept in session state, so each segment is formatted once; the live view
+    appends to them as chunks arrive.
+    """
+    segs = st.session_state.segments or []
+    md, txt = st.session_state.transcript_md, st.session_state.transcript_txt
+    if md is None or len(md) != len(segs):
+        pairs = [segment_lines(s) for s in sorted(segs, key=lambda s: s.get("start", 0))]
+        md = st.session_state.transcript_md = [m for m, _ in pairs]
+        txt = st.session_state.transcript_txt = [t for _, t in pairs]
+    return md, txt
+
+
+class LiveTranscript:
+    """
+    Append-only transcript view for the transcribing phase.
+
+    New lines are sent as new elements instead of re-rendering everything
+    received so far. The view shows one page of `PAGE_LINES` lines; when the
+    newest line starts a new page the old one is replaced, so the browser
+    only ever holds the newest page.
+    """
+
+    def __init__(self, parent, md: List[str], txt: List[str]):
+        self.md, self.txt = md, txt
+        self.caption = parent.empty()
+        self.slot = parent.empty()
+        self.page = self.slot.container()
+        self.page_no = 0
+        self.shown = len(md)
+
+    def extend(self, segments: List[Dict]):
+        for s in segments:
+            md, txt = segment_lines(s)
+            self.md.append(md)
+            self.txt.append(txt)
+
+    def flush(self):
+        if self.shown == len(self.md):
+            return
+        page_no = (len(self.md) - 1) // PAGE_LINES
+        if page_no != self.page_no:
+            self.page = self.slot.container()
+            self.page_no = page_no
+            self.shown = page_no * PAGE_LINES
+            self.caption.caption(f"Showing lines from {self.shown + 1}; the full transcript appears when done.")
+        self.page.markdown("".join(self.md[self.shown:]))
+        self.shown = len(self.md)
+
+
+def show_transcript():
+    md, txt = transcript_lines()
+    if not md:
         return
-    segs = sorted(segments, key=lambda s: s.get("start", 0))
-    md, txt = [], []
-    for s in segs:
-        start = timedelta(seconds=int(s["start"]))
-        end = timedelta(seconds=int(s["end"]))
-        text = s["text"].strip()
-        md.append(f"**[{start}–{end}]** {text}\n\n")
-        txt.append(f"[{start}–{end}] {text}\n\n")
-    md_blob = "".join(md)
-    txt_blob = "".join(txt)
     with st.expander("Transcript Segments", icon=":material/article:"):
-        _, _, c2 = st.columns([1, 6, 1])
+        c1, _, c2 = st.columns([1, 6, 1])
         c2.download_button(
-            ".txt", txt_blob,
+            ".txt", "".join(txt),
             file_name="transcript.txt",
             icon=":material/download:",
             key=f"dl_txt_{st.session_state.file_id}"
         )
-        st.markdown(md_blob)
+        pages = (len(md) + PAGE_LINES - 1) // PAGE_LINES
+        page = 1
+        if pages > 1:
+            page = c1.number_input("Page", min_value=1, max_value=pages, value=1,
+                                   key=f"page_{st.session_state.file_id}")
+        st.markdown("".join(md[(page - 1) * PAGE_LINES:page * PAGE_LINES]))
 
 
 def handle_upload():
     up = st.file_uploader("Upload audio file", type=AUDIO_TYPES,
                           key=st.session_state.file_uploader_key)
     if up and st.session_state.phase == "start":
-        data = up.read()
-        sid = generate_file_id(data, up.name)
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=Path(up.name).suffix)
-        tmp.write(data)
-        st.session_state.audio_path = tmp.name
-        st.session_state.file_id = sid
+        # copy to the store in blocks (hashing on the way) instead of read()
+        up.seek(0)
+        upload = Upload.ingest(up, Path(up.name).suffix)
+        st.session_state.upload = upload
+        st.session_state.audio_path = str(upload.path)
+        st.session_state.file_id = upload.digest
+        # once per upload: reruns must not touch the cache (hit counters, evicted WAVs);
+        # the WAV conversion waits until a transcription is started
+        st.session_state.duration = probe(st.session_state.audio_path).duration
         st.session_state.phase = "uploaded"
         st.rerun()
 
 
+def show_running_jobs():
+    """Offer to reattach to transcriptions of this upload still running in the background."""
+    running = runner.running(st.session_state.file_id)
+    if not running:
+        return
+    with st.expander("Running transcriptions", icon=":material/pending:", expanded=True):
+        for job in running:
+            c1, c2 = st.columns([6, 1])
+            c1.text(f"{job.model}/{job.language}  ·  "
+                    f"{job.chunk_index}/{job.total_chunks} chunks ({int(job.progress * 100)}%)")
+            if c2.button("Attach", key=f"attach_{job.key}"):
+                st.session_state.job_key = job.key
+                st.session_state.phase = "transcribing"
+                st.rerun()
+
+
 def handle_transcription():
     phase = st.session_state.phase
 
@@ -120,52 +205,48 @@ def handle_transcription():
                 st.session_state.phase = "diarized"
             st.rerun()
         build_navigation()
+        show_running_jobs()
 
     elif phase == "transcribing":
+        job = runner.get(st.session_state.job_key)
+        if job is None:
+            # the server restarted; cached chunks make a new run cheap
+            st.session_state.phase = "uploaded"
+            st.rerun()
         build_navigation()
-        st.session_state.prog_bar = st.progress(0.0)
-        st.session_state.prog_text = st.empty()
+        pbar = st.progress(0.0)
+        ptxt = st.empty()
         prog_segs = st.expander("Transcript Segments so far", icon=":material/article:")
-        md_placeholder = prog_segs.empty()
-        segs = []
-        wav = cached_wav(st.session_state.audio_path)
-        pbar = st.session_state.prog_bar
-        ptxt = st.session_state.prog_text
-        t0 = time.time()
-
-        for u in transcribe_stream(
-                wav,
-                model_name=cfg["model"],
-                language=cfg["language"],
-                chunk_size=30,
-        ):
-            if st.session_state.phase != "transcribing":
-                st.warning("Stopped by user.")
-                return
-
-            idx, tot, prog = u["chunk_index"], u["total_chunks"], u["progress"]
-            elapsed = time.time() - t0
+        st.session_state.transcript_md, st.session_state.transcript_txt = [], []
+        live = LiveTranscript(prog_segs, st.session_state.transcript_md, st.session_state.transcript_txt)
+
+        # poll the background job; a rerun (button, refresh) just stops polling
+        while True:
+            active = job.active
+            live.extend(job.segments[len(live.md):])
+            prog = job.progress
+            elapsed = (job.finished or time.time()) - job.started
             eta = (elapsed / prog - elapsed) if prog > 0 else 0.0
-
-            # update progress
             pbar.progress(prog)
-            ptxt.text(f"{idx}/{tot} chunks  |  {int(prog * 100):3d}%  |  "
+            ptxt.text(f"{job.chunk_index}/{job.total_chunks} chunks  |  {int(prog * 100):3d}%  |  "
                       f"Elapsed {format_hms(elapsed)}  |  ETA {format_hms(eta)}")
-            segs.extend(u["segments"])
-            md_lines = []
-            for s in segs:
-                start = timedelta(seconds=int(s["start"]))
-                end = timedelta(seconds=int(s["end"]))
-                text = s["text"].strip()
-                md_lines.append(f"**[{start}–{end}]** {text}\n\n")
-            md_blob = "".join(md_lines)
-
-            # 3) Overwrite the placeholder’s content
-            md_placeholder.markdown(md_blob)
-
-        st.session_state.segments = segs
-        save_cached_segments(st.session_state.file_id, cfg["model"], cfg["language"], segs)
-        st.session_state.phase = "transcribed"
+            live.flush()
+            if not active:
+                break
+            time.sleep(1.0 / UI_FPS)
+
+        runner.collect(job.key)  # the session holds the result now; the job can go
+        if job.state == DONE:
+            st.session_state.segments = list(job.segments)
+            st.session_state.phase = "transcribed"
+        elif job.state == FAILED:
+            st.error(f"Transcription failed: {job.error}")
+            st.session_state.phase = "uploaded"
+            return
+        else:
+            st.warning("Stopped by user.")
+            st.session_state.phase = "uploaded"
+            return
         pbar.empty()
         ptxt.empty()
         prog_segs.empty()
@@ -173,7 +254,24 @@ def handle_transcription():
 
     elif phase == "transcribed":
         build_navigation()
-        show_transcript(st.session_state.segments)
+        show_transcript()
+
+
+def show_stats():
+    """Per-stage timings and cache hit rates of this server process (all sessions)."""
+    summary = metrics.summary()
+    if not summary["stages"]:
+        return
+    with st.expander("Stats", icon=":material/monitoring:"):
+        st.dataframe(
+            [{"stage": name, **{k: v for k, v in s.items() if k != "peak_rss_bytes"},
+              "peak_rss_mb": round(s["peak_rss_bytes"] / (1 << 20), 1)}
+             for name, s in summary["stages"].items()],
+            hide_index=True,
+        )
+        if summary["caches"]:
+            st.dataframe([{"cache": kind, **c} for kind, c in summary["caches"].items()], hide_index=True)
+        st.caption("RTF = wall time / audio seconds (below 1 is faster than real time).")
 
 
 def build_navigation():
@@ -184,10 +282,28 @@ def build_navigation():
         st.rerun()
     if st.session_state.phase == 'uploaded':
         if c1.button("Start Transcription", icon=":material/play_arrow:", type="primary"):
+            with st.spinner("Converting audio …"):
+                wav_path = cached_wav(st.session_state.audio_path)
+            # pyannote only needs the audio: start it now, alongside Whisper
+            if cfg.get("hf_token", "").strip():
+                st.session_state.diar_future = start_diarization(wav_path, cfg["hf_token"])
+            job = runner.submit(
+                st.session_state.file_id,
+                wav_path,
+                cfg["model"], cfg["language"],
+                chunk_size=30,
+                vad=cfg.get("vad", False),
+                workers=cfg.get("workers", 1),
+                batch_size=cfg.get("batch_size", 1),
+            )
+            st.session_state.job_key = job.key
             st.session_state.phase = "transcribing"
             st.rerun()
     if st.session_state.phase in ["transcribing", "diarizing"]:
         if c1.button("Cancel", icon=":material/cancel:", type="secondary"):
+            job = runner.get(st.session_state.job_key) if st.session_state.job_key else None
+            if job is not None and st.session_state.phase == "transcribing":
+                job.cancel()  # takes effect after the chunk in flight
             st.session_state.phase = "uploaded"
             st.rerun()
     if st.session_state.phase == "transcribed":
@@ -216,6 +332,15 @@ def handle_diarization():
         mdl = cfg["model"]
         lang = cfg["language"]
         turns = load_cached_turns(fid, mdl, lang)
+        future = st.session_state.pop("diar_future", None)
+        if not turns and future is not None:
+            # background diarization started with the transcription
+            if not future.done():
+                txt.text("Waiting for background speaker separation to finish …")
+            try:
+                metrics.merge(future.result()[2])
+            except Exception as exc:
+                st.warning(f"Background diarization failed, retrying here: {exc}")
         if not turns:
             # define our Streamlit callback
             def progress_cb(step_name, completed, total):
@@ -241,7 +366,7 @@ def handle_diarization():
     elif phase == "diarized":
         build_navigation()
         turns = st.session_state.turns
-        show_transcript(st.session_state.segments)
+        show_transcript()
         prev_speaker = None
         prev_start_time = None
         buffer_msg = None
@@ -294,7 +419,10 @@ def handle_diarization():
 header_with_badges("Transcribe & Diarize")
 handle_upload()
 if st.session_state.audio_path:
-    st.audio(open(st.session_state.audio_path, "rb"),
+    st.audio(st.session_state.audio_path,
              format=f"audio/{Path(st.session_state.audio_path).suffix[1:]}")
+    if st.session_state.duration is not None:
+        st.caption(f"Duration {format_hms(st.session_state.duration)}")
     handle_transcription()
     handle_diarization()
+    show_stats()
@@ -1,5 +1,8 @@
+import os
 import streamlit as st
 from sonify.utils.session import init_session, reset_state
+from sonify.utils.models import whisper_models, diarization_pipelines
+from sonify.utils.resources import scheduler
 
 MODELS = ["tiny", "base", "small", "medium", "large"]
 LANGUAGES_DICT = {
@@ -142,6 +145,31 @@ current_lang = LANGUAGES_DICT[st.selectbox(
     help="Start typing to filter"
 )]
 
+current_workers = int(st.number_input(
+    "Transcription workers",
+    min_value=1,
+    max_value=max(1, os.cpu_count() or 1),
+    value=int(cfg.get("workers", 1)),
+    key="workers-sb",
+    help="Number of worker processes transcribing 30 s chunks in parallel. Each worker holds its own model copy in RAM."
+))
+
+current_batch = int(st.number_input(
+    "Chunks per encoder pass",
+    min_value=1,
+    max_value=32,
+    value=int(cfg.get("batch_size", 1)),
+    key="batch_size-sb",
+    help="Decode several 30 s chunks in one batched forward pass. Higher values use more RAM."
+))
+
+current_vad = st.toggle(
+    "Skip silence (VAD)",
+    value=cfg.get("vad", False),
+    key="vad-sb",
+    help="Cut chunks in pauses instead of every 30 s and skip silent stretches."
+)
+
 current_token = st.text_input(
     "HuggingFace token",
     value=cfg.get("hf_token", ""),
@@ -158,7 +186,9 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-if cfg.get("model") != current_model or cfg.get("language") != current_lang or cfg.get("hf_token") != current_token:
+if (cfg.get("model") != current_model or cfg.get("language") != current_lang
+        or cfg.get("hf_token") != current_token or cfg.get("workers", 1) != current_workers
+        or cfg.get("vad", False) != current_vad or cfg.get("batch_size", 1) != current_batch):
     if st.session_state.phase != "start":
         st.warning("Changes during transcription/diarization will result in a loss of progress.")
     # Create two columns; button lives in the narrow right column
@@ -169,6 +199,9 @@ if cfg.get("model") != current_model or cfg.get("language") != current_lang or c
         cfg["model"] = current_model
         cfg["language"] = current_lang
         cfg["hf_token"] = current_token
+        cfg["workers"] = current_workers
+        cfg["vad"] = current_vad
+        cfg["batch_size"] = current_batch
         st.success("Settings saved. You can now proceed to Transcribe & Diarize.")
         st.session_state.changed_cfg = False
         if st.session_state.phase != "start":
@@ -177,3 +210,64 @@ if cfg.get("model") != current_model or cfg.get("language") != current_lang or c
         st.rerun()
         # Optionally reset state so changes take effect immediately:
         # _raw_reset()
+
+with st.expander("Model cache", icon=":material/memory:"):
+    stats = whisper_models.stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Hits", stats["hits"])
+    m2.metric("Loads", stats["misses"])
+    m3.metric("Load time", f"{stats['load_seconds']:.1f}s")
+    m4.metric("Resident", f"{stats['resident_bytes'] / (1 << 20):.0f} MB")
+    budget_mb = st.number_input(
+        "RAM budget (MB, 0 = unlimited)",
+        min_value=0,
+        value=stats["ram_budget"] >> 20,
+        step=512,
+        help="Least-recently-used Whisper models are unloaded once this budget is exceeded. Shared by all sessions.",
+    )
+    b1, _, b2 = st.columns([1, 6, 1])
+    if b1.button("Apply budget"):
+        whisper_models.set_budget(int(budget_mb) << 20)
+        st.rerun()
+    if b2.button("Unload", icon=":material/delete:"):
+        whisper_models.unload()
+        st.rerun()
+
+    st.divider()
+    pstats = diarization_pipelines.stats()
+    p1, p2, p3, p4 = st.columns(4)
+    p1.metric("Pipeline hits", pstats["hits"])
+    p2.metric("Pipeline loads", pstats["misses"])
+    p3.metric("Pipeline load time", f"{pstats['load_seconds']:.1f}s")
+    p4.metric("Warm pipelines", len(pstats["resident"]))
+    _, _, b3 = st.columns([1, 6, 1])
+    if b3.button("Unload", icon=":material/delete:", key="unload-pipelines"):
+        diarization_pipelines.unload()
+        st.rerun()
+
+with st.expander("CPU resources", icon=":material/developer_board:"):
+    st.caption(f"Current budget: {scheduler.describe()}")
+    cpus = st.number_input(
+        "CPU cores (0 = all)",
+        min_value=0,
+        max_value=max(1, os.cpu_count() or 1),
+        value=int(os.environ.get("SONIFY_CPUS") or 0),
+        help="Cores shared by all transcription and diarization workers of this server. "
+             "Concurrent jobs and their workers each get an equal slice.",
+    )
+    pin = st.toggle(
+        "Pin workers to their cores",
+        value=scheduler.pin,
+        help="Set CPU affinity so workers stay on their own cores (Linux).",
+    )
+    interop = st.number_input(
+        "torch inter-op threads per process",
+        min_value=1,
+        max_value=max(1, os.cpu_count() or 1),
+        value=scheduler.interop,
+    )
+    _, _, b4 = st.columns([1, 6, 1])
+    if b4.button("Apply", key="apply-cpu"):
+        scheduler.configure(int(cpus), pin, int(interop))
+        scheduler.apply(scheduler.cores())
+        st.rerun()
@@ -0,0 +1,149 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .align import align_segments
+from .diarize import cached_turns, diarize_turns
+from .transcribe import cached_wav, transcribe_with_cache
+from .utils.metrics import metrics
+from .utils.resources import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Share of the CPU cores given to pyannote while Whisper runs alongside it
+DEFAULT_DIARIZE_SHARE = 0.5
+
+
+def split_cores(diarize_share: float = DEFAULT_DIARIZE_SHARE) -> Tuple[List[int], List[int]]:
+    """Split this process's core budget into (whisper_cores, diarize_cores), each ≥ 1 core."""
+    whisper_cores, diarize_cores = scheduler.split(2, shares=(1.0 - diarize_share, diarize_share))
+    return whisper_cores, diarize_cores
+
+
+def _diarize_job(src: str, hf_token: str) -> Tuple[Dict, Dict, Dict]:
+    from .utils.models import diarization_pipelines
+    metrics.reset()
+    return diarize_turns(src, hf_token), diarization_pipelines.stats(), metrics.snapshot()
+
+
+_diarize_pool: ProcessPoolExecutor | None = None
+_diarize_lock = threading.Lock()
+
+
+def _diarize_executor(cores: List[int]) -> ProcessPoolExecutor:
+    """
+    The shared background diarization process.
+
+    It lives as long as this process, so its warm pyannote pipeline is reused
+    by every later file or session. `cores` only applies on first start.
+    """
+    global _diarize_pool
+    with _diarize_lock:
+        if _diarize_pool is None:
+            _diarize_pool = scheduler.pool(1, cores=cores)
+        return _diarize_pool
+
+
+def _drop_diarize_pool(pool: ProcessPoolExecutor):
+    """Forget a pool whose worker died, so the next submission starts a fresh one."""
+    global _diarize_pool
+    with _diarize_lock:
+        if _diarize_pool is pool:
+            _diarize_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_diarize_pool():
+    global _diarize_pool
+    with _diarize_lock:
+        pool, _diarize_pool = _diarize_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def start_diarization(src: str, hf_token: str, diarize_share: float = DEFAULT_DIARIZE_SHARE) -> Future:
+    """
+    Submit raw diarization of `src` to the shared background process.
+
+    The worker writes the raw-turns cache, so a later `diarize_audio` on the
+    same audio only aligns. The future resolves to (raw turns, pipeline
+    registry stats, metrics snapshot of the job). If the worker dies (OOM,
+    a crash in pyannote), that future raises BrokenProcessPool and the next
+    call starts a new worker.
+    """
+    _, diar_cores = split_cores(diarize_share)
+    pool = _diarize_executor(diar_cores)
+    try:
+        future = pool.submit(_diarize_job, src, hf_token)
+    except BrokenProcessPool:
+        _drop_diarize_pool(pool)
+        pool = _diarize_executor(diar_cores)
+        future = pool.submit(_diarize_job, src, hf_token)
+
+    def on_done(f: Future):
+        if not f.cancelled() and isinstance(f.exception(), BrokenProcessPool):
+            logger.warning("Diarization worker died; it will be restarted for the next file")
+            _drop_diarize_pool(pool)
+
+    future.add_done_callback(on_done)
+    return future
+
+
+def transcribe_and_diarize(
+        src: str,
+        model_name: str,
+        language: str,
+        hf_token: str,
+        force: bool = False,
+        chunk_size: int | None = None,
+        workers: int = 1,
+        vad: bool = False,
+        batch_size: int = 1,
+        diarize_share: float = DEFAULT_DIARIZE_SHARE,
+        fields: Sequence[str] | None = None,
+) -> Tuple[Dict[str, Any], List[Dict]]:
+    """
+    Transcribe and diarize `src` concurrently, then align.
+
+    pyannote only needs the audio, so it starts in the shared background
+    process on the cached WAV while Whisper transcribes here; the CPU cores
+    are split between the two by `diarize_share`. Wall-clock time approaches
+    the slower of the two stages instead of their sum.
+
+    Returns (transcription result, aligned speaker turns).
+    """
+    cached_wav(src)  # convert once, before both stages need it
+    diar = cached_turns(src)
+    if diar is not None:
+        result = transcribe_with_cache(
+            src, model_name, language, force=force, chunk_size=chunk_size,
+            workers=workers, vad=vad, batch_size=batch_size, fields=fields,
+        )
+        return result, _align(diar, result)
+
+    whisper_cores, diar_cores = split_cores(diarize_share)
+    logger.info(f"Running transcription ({len(whisper_cores)} cores) and diarization "
+                f"({len(diar_cores)} cores) concurrently")
+
+    diar_future = start_diarization(src, hf_token, diarize_share)
+
+    with scheduler.using(whisper_cores):
+        result = transcribe_with_cache(
+            src, model_name, language, force=force, chunk_size=chunk_size,
+            workers=workers, vad=vad, batch_size=batch_size, cores=whisper_cores, fields=fields,
+        )
+    diar, pipeline_stats, diar_metrics = diar_future.result()
+    metrics.merge(diar_metrics)
+    logger.debug(f"Diarization pipeline registry: {pipeline_stats}")
+
+    return result, _align(diar, result)
+
+
+def _align(diar: Dict, result: Dict[str, Any]) -> List[Dict]:
+    raw_turns = [(t["speaker"], t["start"], t["end"]) for t in diar["turns"]]
+    with metrics.stage("align"):
+        return align_segments(raw_turns, result.get("segments", []) or [], use_words=True)
@@ -1,43 +1,38 @@
+import atexit
 import hashlib
 import json
 import subprocess
 import logging
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from tempfile import mkdtemp
-import math
-import shutil
-from typing import  Dict, Any, Generator, Callable
-
-# Cache directories
-CACHE_ROOT = Path.home() / ".cache" / "sonify"
-TXT_CACHE = CACHE_ROOT / "json"
-WAV_CACHE = CACHE_ROOT / "wav"
-CHUNK_CACHE = WAV_CACHE / "chunks"
-
-for folder in (TXT_CACHE, WAV_CACHE, CHUNK_CACHE):
-    folder.mkdir(parents=True, exist_ok=True)
+from contextlib import ExitStack
+from typing import  Dict, Any, Generator, Callable, List, Sequence, Tuple
+import numpy as np
+from sonify.utils.cache import params_key, store
+from sonify.utils.metrics import metrics
+from sonify.utils.models import get_whisper_model, whisper_model
+from sonify.utils.resources import scheduler
+from sonify.utils.audio import SAMPLE_RATE, AudioInfo, load_pcm, wav_info, to_float32, chunk_spans, iter_chunks
+from sonify.utils.vad import vad_spans
+from sonify.batched import WINDOW_SAMPLES, transcribe_batch
 
 logger = logging.getLogger(__name__)
 
 
 # -----------------------------------------------------------------------------
-# Hash helpers
+# Cache keys (content digest + parameters, see sonify.utils.cache)
 # -----------------------------------------------------------------------------
 
-def _sha256_file(path: str, block: int = 1 << 20) -> str:
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(block), b""):
-            h.update(chunk)
-    return h.hexdigest()[:16]
+def _cache_key(src: str, model: str, lang: str) -> str:
+    return params_key(store.digest(src), model=model, language=lang)
 
 
-def _cache_key(src: str, model: str, lang: str) -> str:
-    h = hashlib.sha256()
-    h.update(Path(src).read_bytes())
-    h.update(model.encode())
-    h.update(lang.encode())
-    return h.hexdigest()[:16]
+def _chunk_cache_key(samples: np.ndarray, model: str, lang: str) -> str:
+    digest = hashlib.sha256(np.ascontiguousarray(samples).data).hexdigest()
+    return params_key(digest, model=model, language=lang)
 
 
 # -----------------------------------------------------------------------------
@@ -45,16 +40,28 @@ def _cache_key(src: str, model: str, lang: str) -> str:
 # -----------------------------------------------------------------------------
 
 def cached_wav(input_path: str) -> str:
-    wav_hash = _sha256_file(input_path)
-    wav_path = WAV_CACHE / f"{wav_hash}.wav"
-    if wav_path.exists():
-        logger.debug(f"Found cached WAV: {wav_path}")
-        return str(wav_path)
-    subprocess.run([
-        "ffmpeg", "-loglevel", "error", "-y", "-i", input_path,
-        "-ac", "1", "-ar", "16000", str(wav_path)
-    ], check=True)
-    logger.debug(f"Converted and cached WAV: {wav_path}")
+    """
+    16 kHz mono PCM copy of `input_path`, converted once per content digest.
+
+    Concurrent callers (sessions, batch workers) for the same content wait
+    for the one ffmpeg run instead of starting their own, and the WAV is
+    only published once ffmpeg has finished writing it.
+    """
+    if Path(input_path).resolve().parent == (store.root / "wav").resolve():
+        return str(input_path)  # already a cached WAV (e.g. a reattached job)
+    wav_hash = store.digest(input_path)
+
+    def convert(tmp):
+        logger.debug(f"Converting {input_path} to 16 kHz mono WAV …")
+        with metrics.stage("convert") as info:
+            subprocess.run([
+                "ffmpeg", "-loglevel", "error", "-y", "-i", input_path,
+                "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", "-f", "wav", str(tmp)
+            ], check=True)
+            info["audio_seconds"] = wav_info(str(tmp)).duration
+
+    wav_path = store.fill("wav", wav_hash, convert, ".wav")
+    logger.debug(f"Cached WAV: {wav_path}")
     return str(wav_path)
 
 
@@ -62,14 +69,358 @@ def cached_wav(input_path: str) -> str:
 # Core transcription helpers
 # -----------------------------------------------------------------------------
 
-def _transcribe_simple(wav_path: str, model_name: str, language: str) -> Dict[str, Any]:
-    import whisper
-    model = whisper.load_model(model_name)
-    logger.info(f"Transcribing {wav_path} with {model_name} ({language}) …")
-    if language == "auto":
-        return model.transcribe(wav_path,verbose=False, fp16=False)
+def _transcribe_simple(audio: str | np.ndarray, model_name: str, language: str) -> Dict[str, Any]:
+    if isinstance(audio, str):
+        logger.info(f"Transcribing {audio} with {model_name} ({language}) …")
+        seconds = wav_info(audio).duration
     else:
-        return model.transcribe(wav_path, language=language, verbose=False ,fp16=False)
+        seconds = len(audio) / SAMPLE_RATE
+        logger.debug(f"Transcribing {seconds:.1f}s window with {model_name} ({language}) …")
+    with whisper_model(model_name) as model, metrics.stage("transcribe", seconds, model=model_name):
+        if language == "auto":
+            return model.transcribe(audio, verbose=False, fp16=False)
+        else:
+            return model.transcribe(audio, language=language, verbose=False ,fp16=False)
+
+
+def _load_chunk_cache(key: str, fields: Sequence[str] | None = None) -> Dict[str, Any] | None:
+    return store.read_result("chunks", key, fields)
+
+
+def _save_chunk_cache(key: str, res: Dict[str, Any]):
+    store.write_result("chunks", key, res)
+
+
+class ChunkManifest:
+    """
+    Append-only progress log of one chunked run, stored as kind "manifests".
+
+    Keyed by audio digest, model, language and chunking parameters. The
+    first line holds the span plan; every finished chunk appends its index,
+    start offset and chunk-cache key. A restarted run reuses the plan (no
+    VAD pass) and the recorded keys (no rehashing of finished windows).
+    """
+
+    def __init__(self, wav_path: str, model_name: str, language: str, chunk_size: float, vad: bool):
+        self.key = params_key(
+            _wav_id(wav_path), model=model_name, language=language, chunk_size=chunk_size, vad=vad
+        )
+        self.path = store.path("manifests", self.key, ".jsonl")
+
+    def load(self, frames: int) -> Tuple[List[Tuple[int, int]] | None, Dict[int, str]]:
+        """(span plan, {chunk index: cache key}); no plan if missing or for other audio."""
+        plan, keys = None, {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    if "spans" in rec:
+                        plan = [tuple(span) for span in rec["spans"]] if rec.get("frames") == frames else None
+                    elif plan is not None:
+                        keys[rec["idx"]] = rec["key"]
+        except FileNotFoundError:
+            pass
+        return plan, keys if plan is not None else {}
+
+    def start(self, spans: List[Tuple[int, int]], frames: int):
+        with store.publish("manifests", self.key, ".jsonl") as tmp:
+            tmp.write_text(json.dumps({"frames": frames, "spans": spans}) + "\n", "utf-8")
+
+    def record(self, idx: int, start: int, key: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"idx": idx, "start": start, "key": key}) + "\n")
+
+    def finish(self):
+        store.reindex("manifests", self.key, ".jsonl")
+
+
+def _wav_id(wav_path: str) -> str:
+    # `cached_wav` names WAVs by digest; anything else is hashed (once, indexed)
+    path = Path(wav_path).resolve()
+    if path.parent == (store.root / "wav").resolve():
+        return path.stem
+    return store.digest(path)
+
+
+# -----------------------------------------------------------------------------
+# Chunk workers
+# -----------------------------------------------------------------------------
+
+def _init_worker(model_name: str):
+    """Process-pool initializer: warm the model once (thread settings are already applied)."""
+    get_whisper_model(model_name)
+
+
+ChunkPoolKey = Tuple[str, int, Tuple[int, ...]]  # (model, workers, cores)
+
+_chunk_pools: Dict[ChunkPoolKey, ProcessPoolExecutor] = {}
+_chunk_users: Counter = Counter()
+_chunk_lock = threading.Lock()
+
+
+def _chunk_executor(key: ChunkPoolKey) -> ProcessPoolExecutor:
+    """
+    This process's chunk pool for (model, workers, cores).
+
+    Like `pipeline._diarize_executor`, it lives as long as this process, so
+    its workers keep their warm models for every later file or job. Starting
+    a pool retires idle pools on overlapping cores (e.g. after a model switch).
+    """
+    model_name, workers, cores = key
+    with _chunk_lock:
+        pool = _chunk_pools.get(key)
+        if pool is None:
+            for other in [k for k in _chunk_pools if not _chunk_users[k] and set(k[2]) & set(cores)]:
+                _chunk_pools.pop(other).shutdown(wait=False, cancel_futures=True)
+            pool = _chunk_pools[key] = scheduler.pool(workers, _init_worker, (model_name,), cores=cores)
+        return pool
+
+
+def _drop_chunk_pool(key: ChunkPoolKey, pool: ProcessPoolExecutor):
+    """Forget a pool whose worker died, so the next submission starts a fresh one."""
+    with _chunk_lock:
+        if _chunk_pools.get(key) is pool:
+            del _chunk_pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _use_chunk_pool(key: ChunkPoolKey, delta: int):
+    with _chunk_lock:
+        _chunk_users[key] += delta
+        if _chunk_users[key] <= 0:
+            del _chunk_users[key]
+
+
+@atexit.register
+def _shutdown_chunk_pools():
+    with _chunk_lock:
+        pools = list(_chunk_pools.values())
+        _chunk_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _transcribe_windows(
+        windows: List[np.ndarray], model_name: str, language: str, batch_size: int = 1
+) -> List[Dict[str, Any]]:
+    """Transcribe float32 windows, batching the encoder pass when batch_size > 1."""
+    if batch_size <= 1 or len(windows) == 1:
+        return [_transcribe_simple(w, model_name, language) for w in windows]
+    with whisper_model(model_name) as model, \
+            metrics.stage("transcribe_batch", sum(len(w) for w in windows) / SAMPLE_RATE, model=model_name):
+        batched = transcribe_batch(model, windows, language)
+    # windows that failed the greedy pass get Whisper's temperature fallback
+    return [
+        res if res is not None else _transcribe_simple(w, model_name, language)
+        for w, res in zip(windows, batched)
+    ]
+
+
+def _worker_transcribe(
+        wav_path: str, spans: List[Tuple[int, int]], model_name: str, language: str, batch_size: int
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Pool task: results for `spans`, plus this task's metrics for the parent to merge."""
+    metrics.reset()
+    samples = load_pcm(wav_path)
+    windows = [to_float32(samples[start:stop]) for start, stop in spans]
+    return _transcribe_windows(windows, model_name, language, batch_size), metrics.snapshot()
+
+
+def _iter_chunk_results(
+        wav_path: str,
+        spans: List[Tuple[int, int]],
+        model_name: str,
+        language: str,
+        force: bool = False,
+        workers: int = 1,
+        batch_size: int = 1,
+        cores: Sequence[int] | None = None,
+        manifest: ChunkManifest | None = None,
+        known: Dict[int, str] | None = None,
+        fields: Sequence[str] | None = None,
+) -> Generator[Tuple[int, int, Dict[str, Any]], None, None]:
+    """
+    Yield (index, start_sample, result) for every span, in timeline order.
+
+    Cached windows are answered directly; `known` cache keys (from a
+    manifest) are trusted instead of rehashing their windows, and each newly
+    finished chunk is appended to `manifest`. Cached results only carry
+    the segment `fields` asked for (default: all). The remaining windows are grouped
+    into batches of `batch_size` that share one encoder pass; with
+    `workers > 1` the batches are fanned out to a process pool whose workers
+    each keep one warm model and an equal share of `cores` (default: this
+    process's budget, see `sonify.utils.resources`). The pool outlives the
+    call, so later files and jobs reuse its warm workers.
+    """
+    samples = load_pcm(wav_path)
+    known = known or {}
+    keys = [
+        known.get(idx) or _chunk_cache_key(chunk, model_name, language)
+        for idx, _, chunk in iter_chunks(samples, spans)
+    ]
+    # results by cache key: identical windows (e.g. digital silence) share one
+    done: Dict[str, Dict[str, Any]] = {}
+    if not force:
+        for k in dict.fromkeys(keys):
+            res = _load_chunk_cache(k, fields)
+            if res is not None:
+                done[k] = res
+    missing = [k for k in dict.fromkeys(keys) if k not in done]
+
+    span_of: Dict[str, Tuple[int, int]] = {}
+    for k, span in zip(keys, spans):
+        span_of.setdefault(k, span)
+
+    if batch_size > 1 and any(stop - start > WINDOW_SAMPLES for start, stop in spans):
+        logger.warning("Chunks longer than 30 s cannot be batched; decoding one at a time")
+        batch_size = 1
+    batches = [missing[i:i + max(1, batch_size)] for i in range(0, len(missing), max(1, batch_size))]
+    batch_of = {k: b for b, batch in enumerate(batches) for k in batch}
+
+    def claim(b: int) -> Tuple[ExitStack, List[str]]:
+        """
+        Lock batch b's chunks (in timeline order, so concurrent runs on the
+        same audio cannot deadlock) and drop those another process filled
+        while we waited.
+        """
+        stack = ExitStack()
+        remaining = []
+        try:
+            for k in batches[b]:
+                stack.enter_context(store.locked("chunks", k))
+                res = None if force else store.peek_result("chunks", k, fields)
+                if res is None:
+                    remaining.append(k)
+                else:
+                    done[k] = res
+        except BaseException:
+            stack.close()
+            raise
+        return stack, remaining
+
+    def publish(remaining: List[str], results: List[Dict[str, Any]]):
+        for k, r in zip(remaining, results):
+            _save_chunk_cache(k, r)
+            done[k] = r
+
+    pool = pool_key = None
+    in_flight: Dict[int, Tuple[Any, ExitStack, List[str]]] = {}
+    next_batch = 0
+
+    def submit(spans_: List[Tuple[int, int]]):
+        nonlocal pool
+        args = (_worker_transcribe, wav_path, spans_, model_name, language, batch_size)
+        try:
+            return pool.submit(*args)
+        except BrokenProcessPool:
+            _drop_chunk_pool(pool_key, pool)
+            pool = _chunk_executor(pool_key)
+            return pool.submit(*args)
+
+    def refill():
+        # keep a bounded window of batches claimed and submitted, in order
+        nonlocal next_batch
+        while next_batch < len(batches) and len(in_flight) < 2 * workers:
+            b, next_batch = next_batch, next_batch + 1
+            stack, remaining = claim(b)
+            if not remaining:
+                stack.close()
+                continue
+            try:
+                fut = submit([span_of[k] for k in remaining])
+            except BaseException:
+                stack.close()
+                raise
+            in_flight[b] = (fut, stack, remaining)
+
+    if workers > 1 and len(batches) > 1:
+        # the full worker count, not one per batch: the pool is reused across runs
+        pool_key = (model_name, workers, tuple(cores or scheduler.cores()))
+        logger.info(f"Transcribing {len(missing)} chunks on {workers} workers sharing {len(pool_key[2])} cores")
+        _use_chunk_pool(pool_key, +1)
+        pool = _chunk_executor(pool_key)
+
+    try:
+        for idx, (start, stop) in enumerate(spans):
+            k = keys[idx]
+            if k not in done:
+                b = batch_of[k]
+                if pool is not None:
+                    refill()
+                    fut, stack, remaining = in_flight.pop(b)
+                    with stack:
+                        try:
+                            results, worker_metrics = fut.result()
+                        except BrokenProcessPool:
+                            _drop_chunk_pool(pool_key, pool)
+                            raise
+                        metrics.merge(worker_metrics)
+                        publish(remaining, results)
+                    refill()
+                else:
+                    stack, remaining = claim(b)
+                    with stack:
+                        if remaining:
+                            windows = [to_float32(samples[slice(*span_of[r])]) for r in remaining]
+                            publish(remaining, _transcribe_windows(windows, model_name, language, batch_size))
+            if manifest is not None and idx not in known:
+                manifest.record(idx, start, k)
+            yield idx, start, done[k]
+        if manifest is not None:
+            manifest.finish()
+    finally:
+        # consumer may stop early (e.g. user cancel): drop queued batches, keep the pool
+        for fut, stack, _ in in_flight.values():
+            fut.cancel()
+            stack.close()
+        if pool_key is not None:
+            _use_chunk_pool(pool_key, -1)
+
+
+def _plan_spans(samples: np.ndarray, info: AudioInfo, chunk_size: float, vad: bool) -> List[Tuple[int, int]]:
+    with metrics.stage("chunking", info.duration, vad=vad):
+        if vad:
+            spans = vad_spans(samples, max_chunk=chunk_size, sr=info.sample_rate)
+            voiced = sum(stop - start for start, stop in spans)
+            logger.info(f"VAD kept {voiced / info.sample_rate:.1f}s of {info.duration:.1f}s in {len(spans)} chunks")
+            return spans
+        return chunk_spans(info.frames, chunk_size, info.sample_rate)
+
+
+def _resume_plan(
+        wav_path: str, model_name: str, language: str, chunk_size: float, vad: bool, force: bool = False
+) -> Tuple[np.ndarray, List[Tuple[int, int]], ChunkManifest, Dict[int, str]]:
+    """
+    Memory-map the audio and lay out its chunks, resuming from the run's
+    manifest when one exists (unless `force`).
+
+    Returns (samples, spans, manifest, {finished chunk index: cache key}).
+    """
+    info = wav_info(wav_path)  # header only, no ffprobe
+    samples = load_pcm(wav_path)
+    manifest = ChunkManifest(wav_path, model_name, language, chunk_size, vad)
+    spans, known = (None, {}) if force else manifest.load(info.frames)
+    if spans is None:
+        spans = _plan_spans(samples, info, chunk_size, vad)
+        manifest.start(spans, info.frames)
+    elif known:
+        logger.info(f"Resuming: {len(known)}/{len(spans)} chunks already done")
+    return samples, spans, manifest, known
+
+
+def _shift_segments(res: Dict[str, Any], offset: float) -> list:
+    # copies: a cached result may back several identical windows
+    shifted = []
+    for s in res.get("segments", []):
+        seg = {**s, "start": s["start"] + offset, "end": s["end"] + offset}
+        if s.get("words"):
+            # word timestamps are window-relative too (used by word-level alignment)
+            seg["words"] = [{**w, "start": w["start"] + offset, "end": w["end"] + offset} for w in s["words"]]
+        shifted.append(seg)
+    return shifted
 
 
 # -----------------------------------------------------------------------------
@@ -83,72 +434,59 @@ def transcribe_with_cache(
         force: bool = False,
         chunk_size: int | None = None,
         progress_callback: Callable[[float], None] = None,
+        workers: int = 1,
+        vad: bool = False,
+        batch_size: int = 1,
+        cores: Sequence[int] | None = None,
+        fields: Sequence[str] | None = None,
 ) -> Dict[str, Any]:
     """
     Full-file transcription, cached.
 
     `chunk_size` is retained for backward compatibility – when provided, the
-    function will split the WAV and stitch results. Internally it re-uses this
-    very same function, so caching still applies per chunk + model + language.
+    cached WAV is memory-mapped and transcribed window by window, with each
+    window cached per content + model + language. `workers > 1` transcribes
+    uncached windows in a process pool; `vad=True` cuts windows in silence
+    (at most `chunk_size` / 30 s long) and skips silent stretches;
+    `batch_size > 1` runs the encoder on that many windows at once;
+    `cores` limits the CPU cores shared by the pool workers.
+    `fields` limits the segment keys read back from the cache (e.g.
+    ("start", "end", "text")); start and end are always included.
     Calls progress_callback(progress) with float in [0,1] if provided.
     """
-    key = _cache_key(src, model_name, language) if chunk_size is None else None
-    cache_file = TXT_CACHE / f"{key}.json" if key else None
-
-    # Load from cache if available, including segments
-    if cache_file and cache_file.exists() and not force:
-        result = json.loads(cache_file.read_text("utf-8"))
-        if "segments" in result and progress_callback:
+    if fields is not None:
+        fields = tuple({*fields, "start", "end"})
+
+    # Whole-file path: one cached result per content + model + language,
+    # produced at most once even when several processes ask concurrently
+    if not chunk_size:
+        key = _cache_key(src, model_name, language)
+        result = store.fill_result(
+            "results", key,
+            lambda: _transcribe_simple(cached_wav(src), model_name, language),
+            force=force, fields=fields,
+        )
+        if progress_callback:
             progress_callback(1.0)
         return result
 
-    if cache_file and cache_file.exists():
-        cache_file.unlink()
-
     wav_path = cached_wav(src)
 
-    # Recursive chunking path
-    if chunk_size:
-        dur = float(
-            subprocess.check_output([
-                "ffprobe", "-v", "error", "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1", wav_path
-            ]).decode().strip()
-        )
-        total_chunks = math.ceil(dur / chunk_size)
-        temp_dir = Path(mkdtemp(prefix="chunks_"))
-        subprocess.run([
-            "ffmpeg", "-loglevel", "error", "-y", "-i", wav_path,
-            "-f", "segment", "-segment_time", str(chunk_size),
-            "-c", "copy", str(temp_dir / "chunk_%03d.wav")
-        ], check=True)
-
-        segments, texts = [], []
-        for idx, f in enumerate(sorted(temp_dir.glob("chunk_*.wav"))):
-            if progress_callback:
-                progress_callback(idx / total_chunks)
-            res = transcribe_with_cache(
-                str(f), model_name, language, force, None, progress_callback
-            )
-            off = idx * chunk_size
-            for s in res.get("segments", []):
-                s["start"] += off
-                s["end"] += off
-                segments.append(s)
-            texts.append(res.get("text", ""))
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        result = {"text": " ".join(texts), "segments": segments}
-    else:
-        result = _transcribe_simple(wav_path, model_name, language)
+    # Chunked path: slice the memory-mapped PCM, no temp files
+    _, spans, manifest, known = _resume_plan(wav_path, model_name, language, chunk_size, vad, force)
+    total_chunks = len(spans)
 
-    # Final caching
-    if cache_file:
-        cache_file.write_text(
-            json.dumps(result, ensure_ascii=False, indent=2), "utf-8"
-        )
+    segments, texts = [], []
+    for idx, start, res in _iter_chunk_results(
+            wav_path, spans, model_name, language, force, workers, batch_size, cores,
+            manifest=manifest, known=known, fields=fields):
         if progress_callback:
-            progress_callback(1.0)
-    return result
+            progress_callback(idx / total_chunks)
+        segments.extend(_shift_segments(res, start / SAMPLE_RATE))
+        texts.append(res.get("text", ""))
+    if progress_callback:
+        progress_callback(1.0)
+    return {"text": " ".join(texts), "segments": segments}
 
 
 def transcribe_stream(
@@ -156,82 +494,43 @@ def transcribe_stream(
         model_name: str,
         language: str,
         chunk_size: int = 30,
+        workers: int = 1,
+        vad: bool = False,
+        batch_size: int = 1,
+        cores: Sequence[int] | None = None,
 ) -> Generator[Dict[str, Any], None, None]:
-    import subprocess, math, shutil, json, hashlib
-    from pathlib import Path
-    from tempfile import mkdtemp
-
-    # -------------------------------------------------------------------------
-    # Helpers: per‐chunk cache key + path
-    # -------------------------------------------------------------------------
-    def _chunk_cache_key(chunk_path: str, model: str, lang: str) -> str:
-        h = hashlib.sha256()
-        h.update(Path(chunk_path).read_bytes())
-        h.update(model.encode())
-        h.update(lang.encode())
-        return h.hexdigest()[:16]
-
-    CHUNK_JSON_CACHE = Path.home() / ".cache" / "sonify" / "json" / "chunks"
-    CHUNK_JSON_CACHE.mkdir(parents=True, exist_ok=True)
-
-    # -------------------------------------------------------------------------
-    # 1. figure total duration & number of chunks
-    # -------------------------------------------------------------------------
-    dur = float(
-        subprocess.check_output([
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", wav_path
-        ]).decode().strip()
-    )
-    total_chunks = math.ceil(dur / chunk_size)
-
+    """
+    Transcribe `wav_path` window by window, yielding progress dicts in
+    timeline order. `workers > 1` transcribes windows in a process pool
+    (on `cores`, default: the whole budget); `vad=True` places cuts in
+    silence and skips silent stretches; `batch_size > 1` runs the encoder
+    on that many windows at once.
+    """
     # -------------------------------------------------------------------------
-    # 2. split into fixed-length chunks
+    # 1. memory-map the PCM & lay out chunk spans (or resume the manifest)
     # -------------------------------------------------------------------------
-    temp_dir = Path(mkdtemp(prefix="stream_chunks_"))
-    subprocess.run([
-        "ffmpeg", "-loglevel", "error", "-y", "-i", wav_path,
-        "-f", "segment", "-segment_time", str(chunk_size),
-        "-c", "copy", str(temp_dir / "chunk_%03d.wav")
-    ], check=True)
+    _, spans, manifest, known = _resume_plan(wav_path, model_name, language, chunk_size, vad)
+    total_chunks = len(spans)
 
     # -------------------------------------------------------------------------
-    # 3. transcribe each chunk, loading/saving per-chunk cache
+    # 2. transcribe each window, loading/saving per-chunk cache
     # -------------------------------------------------------------------------
-    all_segs = []
-    chunks = sorted(temp_dir.glob("chunk_*.wav"))
-    for idx, chunk in enumerate(chunks):
-        key = _chunk_cache_key(str(chunk), model_name, language)
-        cache_f = CHUNK_JSON_CACHE / f"{key}.json"
-
-        if cache_f.exists():
-            # load cached result
-            res = json.loads(cache_f.read_text("utf-8"))
-        else:
-            # run Whisper on this chunk
-            res = _transcribe_simple(str(chunk), model_name, language)
-            # save to cache
-            cache_f.write_text(json.dumps(res, ensure_ascii=False, indent=2), "utf-8")
-
-        # shift timestamps into global timeline
-        offset = idx * chunk_size
-        for s in res.get("segments", []):
-            s["start"] += offset
-            s["end"] += offset
-            all_segs.append(s)
+    for idx, start, res in _iter_chunk_results(
+            wav_path, spans, model_name, language, workers=workers, batch_size=batch_size, cores=cores,
+            manifest=manifest, known=known):
+        segs = _shift_segments(res, start / SAMPLE_RATE)
 
         # yield this chunk’s progress and segments
         yield {
             "chunk_index": idx + 1,
             "total_chunks": total_chunks,
             "progress": (idx + 1) / total_chunks,
-            "segments": res.get("segments", []),
+            "segments": segs,
         }
 
     # -------------------------------------------------------------------------
-    # 4. cleanup & final 100% bump
+    # 3. final 100% bump
     # -------------------------------------------------------------------------
-    shutil.rmtree(temp_dir, ignore_errors=True)
     yield {
         "chunk_index": total_chunks,
         "total_chunks": total_chunks,
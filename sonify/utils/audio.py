@@ -0,0 +1,138 @@
+import json
+import struct
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+from sonify.utils.cache import store
+
+# Whisper operates on 16 kHz mono audio; `cached_wav` produces exactly that
+SAMPLE_RATE = 16000
+
+
+class AudioInfo(NamedTuple):
+    sample_rate: int
+    channels: int
+    frames: int
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+
+def _parse_wav(wav_path: str) -> Tuple[int, int, int, int, int, int]:
+    """
+    Walk the RIFF chunks of a WAV file.
+
+    Returns (data_offset, data_bytes, format_tag, channels, sample_rate,
+    bits_per_sample).
+    """
+    size = Path(wav_path).stat().st_size
+    with open(wav_path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"Not a RIFF/WAVE file: {wav_path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in {wav_path}")
+            chunk_id, chunk_len = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_len)
+                tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                fmt = (tag, channels, rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"data chunk before fmt chunk in {wav_path}")
+                offset = f.tell()
+                # streamed/oversized WAVs carry a placeholder length
+                if chunk_len in (0, 0xFFFFFFFF) or offset + chunk_len > size:
+                    chunk_len = size - offset
+                return (offset, chunk_len) + fmt
+            else:
+                f.seek(chunk_len + (chunk_len & 1), 1)
+
+
+def _wav_data_span(wav_path: str) -> Tuple[int, int, int, int, int]:
+    """
+    Locate the samples of a 16-bit PCM WAV file.
+
+    Returns (data_offset, data_bytes, sample_rate, channels, bits_per_sample).
+    """
+    offset, nbytes, tag, channels, rate, bits = _parse_wav(wav_path)
+    if tag not in (1, 0xFFFE) or bits != 16:
+        raise ValueError(f"Unsupported WAV encoding in {wav_path} (tag={tag}, bits={bits})")
+    return offset, nbytes, rate, channels, bits
+
+
+def wav_info(wav_path: str) -> AudioInfo:
+    """Sample rate, channels and frame count read straight from a WAV header."""
+    _, nbytes, _, channels, rate, bits = _parse_wav(wav_path)
+    frame_bytes = max(1, channels * bits // 8)
+    return AudioInfo(rate, channels, nbytes // frame_bytes)
+
+
+def _ffprobe(path: str) -> Dict[str, int]:
+    out = subprocess.check_output([
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+        "-of", "json", path,
+    ])
+    info = json.loads(out)
+    stream = info["streams"][0]
+    rate = int(stream["sample_rate"])
+    duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0.0)
+    return {"sample_rate": rate, "channels": int(stream["channels"]), "frames": int(round(duration * rate))}
+
+
+def probe(path: str) -> AudioInfo:
+    """
+    Audio metadata of any input.
+
+    WAV files are answered from their header in-process. Other containers
+    are probed with ffprobe once per content digest; the result is cached
+    next to the converted WAV (same key, kind "probe").
+    """
+    try:
+        return wav_info(path)
+    except (ValueError, struct.error):
+        pass
+    return AudioInfo(**store.fill_json("probe", store.digest(path), lambda: _ffprobe(path)))
+
+
+def load_pcm(wav_path: str) -> np.ndarray:
+    """
+    Memory-map the samples of a 16 kHz mono 16-bit WAV.
+
+    The returned int16 array is backed by the file, so slicing it is free and
+    nothing is read until a window is actually used.
+    """
+    offset, nbytes, rate, channels, _ = _wav_data_span(wav_path)
+    if rate != SAMPLE_RATE or channels != 1:
+        raise ValueError(f"Expected {SAMPLE_RATE} Hz mono audio, got {rate} Hz x{channels}: {wav_path}")
+    n = nbytes // 2
+    if n == 0:
+        return np.zeros(0, dtype="<i2")
+    return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(n,))
+
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """Convert an int16 window to the float32 [-1, 1) range Whisper expects."""
+    return samples.astype(np.float32) / 32768.0
+
+
+def chunk_spans(n_samples: int, chunk_size: float, sr: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """Fixed-length (start, stop) sample spans covering `n_samples`."""
+    step = int(round(chunk_size * sr))
+    if step <= 0:
+        raise ValueError("chunk_size must be positive")
+    return [(start, min(start + step, n_samples)) for start in range(0, n_samples, step)]
+
+
+def iter_chunks(samples: np.ndarray, spans: List[Tuple[int, int]]) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """Yield (index, start_sample, window) for each span, without copying."""
+    for idx, (start, stop) in enumerate(spans):
+        yield idx, start, samples[start:stop]
@@ -1,55 +1,560 @@
 import json
-
 import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from sonify.utils import columnar
+from sonify.utils.metrics import metrics
+
+try:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _lock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    _UNLINK_HELD = True  # a held lock file can be unlinked; waiters notice via the inode
+except ImportError:  # Windows
+    import msvcrt
+
+    # msvcrt.locking acts at the current file position; the lock is always byte 0
+    def _try_lock(fd: int) -> bool:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _lock(fd: int):
+        while not _try_lock(fd):
+            time.sleep(0.2)
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)  # locked() wrote the owner marker since
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    _UNLINK_HELD = False  # open files cannot be deleted; unlink after closing instead
+
+logger = logging.getLogger(__name__)
+
+
+def _is_file(fd: int, path: Path) -> bool:
+    """Whether `fd` is still the file at `path` (not deleted or replaced since it was opened)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    fst = os.fstat(fd)
+    return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+
+BASE = Path(os.environ.get("SONIFY_CACHE_DIR", Path.home() / ".cache" / "sonify"))
+
+
+def parse_size(text: str | int) -> int:
+    """'20G', '512M', '1.5T' or a plain byte count -> bytes."""
+    if isinstance(text, int):
+        return text
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+# Disk budget for all artifacts (0 = unlimited); enforced on write
+DEFAULT_BUDGET = parse_size(os.environ.get("SONIFY_CACHE_BUDGET", "20G"))
+# Kinds whose lifetime is managed by their owner (uploads: `sonify.utils.session.Upload`
+# refcounts), so LRU eviction skips them unless asked for by `kind`
+PINNED_KINDS = ("uploads",)
+
+
+# -----------------------------------------------------------------------------
+# Hashing
+# -----------------------------------------------------------------------------
+
+def digest_file(path: str | Path, block: int = 1 << 22) -> str:
+    """SHA-256 of a file, streamed through an mmap so it never sits in RAM."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for off in range(0, size, block):
+                    h.update(view[off:off + block])
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+def params_key(digest: str, **params: Any) -> str:
+    """Artifact key: content digest plus the parameters that shaped the artifact."""
+    h = hashlib.sha256(digest.encode())
+    h.update(json.dumps(params, sort_keys=True, separators=(",", ":")).encode())
+    return h.hexdigest()[:32]
+
+
+# -----------------------------------------------------------------------------
+# Store
+# -----------------------------------------------------------------------------
+
+class CacheStore:
+    """
+    Content-addressed artifact store under one root directory.
+
+    Every artifact lives at `<root>/<kind>/<key><suffix>` and is published
+    with write-to-temp + `os.replace`, so readers never see partial files.
+    A SQLite index remembers the digest of each hashed input by
+    (path, size, mtime, inode), so a multi-GB file is hashed once, and
+    records every artifact with its size, last access and per-kind hit
+    counters. Whenever a write pushes the total over `budget` bytes, the
+    least-recently-used artifacts are evicted.
+
+    Fills are single-flight across processes: `locked()` holds an OS file
+    lock per artifact (released automatically if the holder dies), so
+    concurrent producers of the same artifact queue behind the first one and
+    then find its published result instead of redoing the work.
+    """
+
+    def __init__(self, root: str | Path = BASE, budget: int = DEFAULT_BUDGET):
+        self.root = Path(root)
+        self.budget = budget
+        self._local = threading.local()
+
+    # -- index ----------------------------------------------------------------
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.root / "index.sqlite", timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, digest TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " kind TEXT, key TEXT, path TEXT, size INTEGER, created REAL, accessed REAL,"
+                " PRIMARY KEY (kind, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (kind TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def digest(self, path: str | Path) -> str:
+        """Content digest of `path`, answered from the index while the file is unchanged."""
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        row = self.db.execute(
+            "SELECT digest FROM files WHERE path=? AND size=? AND mtime_ns=? AND inode=?",
+            (real, st.st_size, st.st_mtime_ns, st.st_ino),
+        ).fetchone()
+        if row:
+            return row[0]
+        digest = digest_file(real)
+        self._remember(real, st, digest)
+        return digest
+
+    def _remember(self, real: str, st: os.stat_result, digest: str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+            (real, st.st_size, st.st_mtime_ns, st.st_ino, digest),
+        )
 
-BASE = Path.home() / ".cache" / "sonify"
-SEG = BASE / "segments"
-SEG.mkdir(parents=True, exist_ok=True)
-DIAR = BASE / "diar"
-DIAR.mkdir(parents=True, exist_ok=True)
+    def _record(self, kind: str, key: str, path: Path):
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, key, str(path), path.stat().st_size, now, now),
+        )
+        if self.budget and self.total_bytes() > self.budget:
+            self.evict(self.budget, keep=(kind, key))
 
+    def _count(self, kind: str, hit: bool, key: str | None = None):
+        metrics.cache(kind, hit)
+        self.db.execute(
+            "INSERT INTO counters VALUES (?, ?, ?) ON CONFLICT(kind) DO UPDATE SET"
+            " hits = hits + excluded.hits, misses = misses + excluded.misses",
+            (kind, int(hit), int(not hit)),
+        )
+        if hit and key is not None:
+            self.db.execute(
+                "UPDATE artifacts SET accessed=? WHERE kind=? AND key=?", (time.time(), kind, key)
+            )
+
+    # -- maintenance ----------------------------------------------------------
+
+    def total_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def evict(
+            self,
+            budget: int | None = None,
+            max_age: float | None = None,
+            kind: str | None = None,
+            keep: Tuple[str, str] | None = None,
+    ) -> Tuple[int, int]:
+        """
+        Delete artifacts not accessed for `max_age` seconds, then the least
+        recently used ones until the total is within `budget` bytes.
+        `PINNED_KINDS` are only considered when named as `kind`.
+        Returns (artifacts removed, bytes freed).
+        """
+        if kind:
+            where, args = "WHERE kind=?", (kind,)
+        else:
+            where, args = f"WHERE kind NOT IN ({','.join('?' * len(PINNED_KINDS))})", PINNED_KINDS
+        rows = self.db.execute(
+            f"SELECT kind, key, path, size, accessed FROM artifacts {where} ORDER BY accessed", args
+        ).fetchall()
+        total = self.total_bytes()
+        cutoff = time.time() - max_age if max_age is not None else None
+        removed = freed = 0
+        for k, key, path, size, accessed in rows:
+            # rows are oldest-first: once one is fresh and we're in budget, stop
+            expired = cutoff is not None and accessed < cutoff
+            if not expired and (budget is None or total <= budget):
+                break
+            if keep == (k, key):
+                continue
+            Path(path).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM artifacts WHERE kind=? AND key=?", (k, key))
+            total -= size
+            removed += 1
+            freed += size
+        if removed:
+            logger.info(f"Cache eviction removed {removed} artifacts ({freed / (1 << 20):.1f} MB)")
+        return removed, freed
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-kind artifact count, bytes and hit/miss counters, straight from the index."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for kind, count, size in self.db.execute(
+                "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM artifacts GROUP BY kind"):
+            out[kind] = {"count": count, "bytes": size, "hits": 0, "misses": 0}
+        for kind, hits, misses in self.db.execute("SELECT kind, hits, misses FROM counters"):
+            entry = out.setdefault(kind, {"count": 0, "bytes": 0})
+            entry.update(hits=hits, misses=misses)
+        for entry in out.values():
+            lookups = entry["hits"] + entry["misses"]
+            entry["hit_rate"] = round(entry["hits"] / lookups, 3) if lookups else None
+        return out
+
+    def verify(self, deep: bool = False) -> Dict[str, int]:
+        """
+        Check every indexed artifact against the disk: missing or resized files
+        are dropped from the index; with `deep`, JSON artifacts are parsed and
+        unreadable ones deleted. Stale input-digest rows and lock files left
+        by killed producers are pruned as well.
+        """
+        report = {"checked": 0, "missing": 0, "corrupt": 0, "stale_inputs": 0, "stale_locks": 0}
+        for kind, key, path, size in self.db.execute(
+                "SELECT kind, key, path, size FROM artifacts").fetchall():
+            report["checked"] += 1
+            p = Path(path)
+            try:
+                actual = p.stat().st_size
+            except FileNotFoundError:
+                report["missing"] += 1
+                self.db.execute("DELETE FROM artifacts WHERE kind=? AND key=?", (kind, key))
+                continue
+            if p.suffix == ".jsonl" and actual > size:
+                # append-only logs grow in place between index updates
+                self.db.execute("UPDATE artifacts SET size=? WHERE kind=? AND key=?", (actual, kind, key))
+                size = actual
+            bad = actual != size
+            if not bad and deep and p.suffix in (".json", columnar.SUFFIX):
+                try:
+                    if p.suffix == ".json":
+                        json.loads(p.read_text("utf-8"))
+                    else:
+                        columnar.read_header(p)
+                except ValueError:
+                    bad = True
+            if bad:
+                report["corrupt"] += 1
+                self.remove(kind, key, p.suffix)
+        for (path,) in self.db.execute("SELECT path FROM files").fetchall():
+            if not os.path.exists(path):
+                report["stale_inputs"] += 1
+                self.db.execute("DELETE FROM files WHERE path=?", (path,))
+        report["stale_locks"] = self._clear_locks()
+        return report
+
+    def _clear_locks(self) -> int:
+        """Delete lock files nobody holds (left by a killed producer)."""
+        cleared = 0
+        for lock_path in (self.root / ".locks").glob("*.lock"):
+            try:
+                fd = os.open(lock_path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                if not _try_lock(fd):
+                    continue
+                if _UNLINK_HELD and _is_file(fd, lock_path):
+                    lock_path.unlink()
+                    cleared += 1
+                _unlock(fd)
+            finally:
+                os.close(fd)
+            if not _UNLINK_HELD:
+                try:
+                    lock_path.unlink()
+                    cleared += 1
+                except OSError:
+                    pass
+        return cleared
+
+    # -- artifacts ------------------------------------------------------------
+
+    def path(self, kind: str, key: str, suffix: str = ".json") -> Path:
+        return self.root / kind / f"{key}{suffix}"
+
+    @contextmanager
+    def publish(self, kind: str, key: str, suffix: str = ".json") -> Iterator[Path]:
+        """
+        Yield a temp path to write an artifact to; on success it is atomically
+        renamed into place and indexed, on error it is removed.
+        """
+        final = self.path(kind, key, suffix)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        tmp = final.with_name(f".{final.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            yield tmp
+            os.replace(tmp, final)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        self._record(kind, key, final)
+
+    def reindex(self, kind: str, key: str, suffix: str = ".json"):
+        """Update the index after an artifact was appended to in place."""
+        path = self.path(kind, key, suffix)
+        if path.exists():
+            self._record(kind, key, path)
+
+    def ingest(self, src: BinaryIO, suffix: str = "", block: int = 1 << 22) -> Tuple[str, Path]:
+        """
+        Copy a readable stream into the store block by block, hashing as it
+        goes, so the content is never held in memory or read twice.
+        The result is stored as `uploads/<digest><suffix>` and its digest is
+        indexed, so `digest()` on the returned path never re-reads it.
+        Returns (digest, path).
+        """
+        staging = self.root / "uploads"
+        staging.mkdir(parents=True, exist_ok=True)
+        tmp = staging / f".ingest.{os.getpid()}.{threading.get_ident()}.tmp"
+        h = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as out:
+                while block_data := src.read(block):
+                    h.update(block_data)
+                    out.write(block_data)
+            digest = h.hexdigest()
+            final = self.path("uploads", digest, suffix)
+            os.replace(tmp, final)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self._record("uploads", digest, final)
+        real = os.path.realpath(final)
+        self._remember(real, os.stat(real), digest)
+        return digest, final
+
+    @contextmanager
+    def locked(self, kind: str, key: str) -> Iterator[None]:
+        """
+        Exclusive cross-process lock for one artifact. The lock file doubles
+        as the in-progress marker (holder pid and start time) and is deleted
+        on release, so `.locks` only holds fills in progress.
+        """
+        lock_path = self.root / ".locks" / f"{kind.replace('/', '_')}-{key}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not _try_lock(fd):
+                logger.debug(f"Waiting for another producer of {kind}/{key}")
+                _lock(fd)
+            if _is_file(fd, lock_path):
+                break
+            # the previous holder deleted this file on release: lock the current one
+            _unlock(fd)
+            os.close(fd)
+        try:
+            os.ftruncate(fd, 0)
+            os.write(fd, f"{os.getpid()} {time.time():.0f}\n".encode())
+            try:
+                yield
+            finally:
+                if _UNLINK_HELD:
+                    lock_path.unlink(missing_ok=True)
+                _unlock(fd)
+        finally:
+            os.close(fd)
+            if not _UNLINK_HELD:
+                try:
+                    lock_path.unlink()
+                except OSError:
+                    pass  # another process has it open and will delete it
+
+    def fill(self, kind: str, key: str, produce: Callable[[Path], None], suffix: str = ".json") -> Path:
+        """
+        Return the artifact, producing it with `produce(tmp_path)` if missing.
+        Concurrent callers block on the producer and reuse its result.
+        """
+        found = self.lookup(kind, key, suffix)
+        if found is not None:
+            return found
+        final = self.path(kind, key, suffix)
+        with self.locked(kind, key):
+            if final.exists():
+                return final
+            # temp files left by a producer that crashed while holding the lock
+            for stale in final.parent.glob(f".{final.name}.*.tmp"):
+                stale.unlink(missing_ok=True)
+            with self.publish(kind, key, suffix) as tmp:
+                produce(tmp)
+        return final
+
+    def fill_json(self, kind: str, key: str, produce: Callable[[], Any], force: bool = False) -> Any:
+        """Single-flight JSON artifact: cached value, or `produce()` run once and stored."""
+        if not force:
+            obj = self.read_json(kind, key)
+            if obj is not None:
+                return obj
+        with self.locked(kind, key):
+            if not force:
+                obj = self.peek_json(kind, key)
+                if obj is not None:
+                    return obj
+            obj = produce()
+            self.write_json(kind, key, obj)
+            return obj
+
+    def lookup(self, kind: str, key: str, suffix: str = ".json") -> Path | None:
+        """Path of an existing artifact (counted as a hit) or None (a miss)."""
+        fpth = self.path(kind, key, suffix)
+        hit = fpth.exists()
+        self._count(kind, hit, key)
+        return fpth if hit else None
+
+    def peek_json(self, kind: str, key: str) -> Any | None:
+        """Like `read_json`, but not counted as a lookup (for re-checks under a lock)."""
+        fpth = self.path(kind, key)
+        try:
+            return json.loads(fpth.read_text("utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            fpth.unlink(missing_ok=True)
+            return None
+
+    def read_json(self, kind: str, key: str) -> Any | None:
+        obj = self.peek_json(kind, key)
+        self._count(kind, obj is not None, key)
+        return obj
+
+    def write_json(self, kind: str, key: str, obj: Any):
+        with self.publish(kind, key) as tmp:
+            tmp.write_text(json.dumps(obj, ensure_ascii=False, separators=(",", ":")), "utf-8")
+
+    # -- transcription results (columnar, see sonify.utils.columnar) -----------
+
+    def peek_result(self, kind: str, key: str, fields: Sequence[str] | None = None) -> Dict[str, Any] | None:
+        """Columnar result, loading only the segment `fields` asked for."""
+        fpth = self.path(kind, key, columnar.SUFFIX)
+        try:
+            return columnar.read_result(fpth, fields)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):  # damaged file; I/O errors propagate and keep the entry
+            fpth.unlink(missing_ok=True)
+            return None
+
+    def read_result(self, kind: str, key: str, fields: Sequence[str] | None = None) -> Dict[str, Any] | None:
+        obj = self.peek_result(kind, key, fields)
+        self._count(kind, obj is not None, key)
+        return obj
+
+    def write_result(self, kind: str, key: str, result: Dict[str, Any]):
+        with self.publish(kind, key, columnar.SUFFIX) as tmp:
+            columnar.write_result(tmp, result)
+
+    def fill_result(
+            self,
+            kind: str,
+            key: str,
+            produce: Callable[[], Dict[str, Any]],
+            force: bool = False,
+            fields: Sequence[str] | None = None,
+    ) -> Dict[str, Any]:
+        """Single-flight columnar result: cached (only `fields`), or `produce()` run once and stored."""
+        if not force:
+            obj = self.read_result(kind, key, fields)
+            if obj is not None:
+                return obj
+        with self.locked(kind, key):
+            if not force:
+                obj = self.peek_result(kind, key, fields)
+                if obj is not None:
+                    return obj
+            obj = produce()
+            self.write_result(kind, key, obj)
+        return obj
+
+    def remove(self, kind: str, key: str, suffix: str = ".json"):
+        self.path(kind, key, suffix).unlink(missing_ok=True)
+        self.db.execute("DELETE FROM artifacts WHERE kind=? AND key=?", (kind, key))
+
+
+store = CacheStore()
+
+
+# -----------------------------------------------------------------------------
+# Streamlit session caches (aligned segments / turns per file + settings)
+# -----------------------------------------------------------------------------
 
 def _cache_key(file_id: str, model: str, language: str) -> str:
-    raw = f"{file_id}-{model}-{language}"
-    return hashlib.md5(raw.encode()).hexdigest()
+    return params_key(file_id, model=model, language=language)
 
 
 def load_cached_segments(file_id: str, model: str, language: str) -> List[Dict]:
-    key = _cache_key(file_id, model, language)
-    fpth = SEG / f"{key}.json"
-    if fpth.exists():
-        try:
-            return json.loads(fpth.read_text())
-        except:
-            fpth.unlink()
-    return []
+    return store.read_json("segments", _cache_key(file_id, model, language)) or []
 
 
 def save_cached_segments(file_id: str, model: str, language: str, segs: List[Dict]):
-    key = _cache_key(file_id, model, language)
-    fpth = SEG / f"{key}.json"
-    fpth.write_text(json.dumps(segs))
+    store.write_json("segments", _cache_key(file_id, model, language), segs)
 
 
 def load_cached_turns(file_id: str, model: str, language: str) -> List[Dict]:
-    key = _cache_key(file_id, model, language)
-    fpth = DIAR / f"{key}.json"
-    if fpth.exists():
-        try:
-            return json.loads(fpth.read_text())
-        except:
-            fpth.unlink()
-    return []
+    return store.read_json("diar", _cache_key(file_id, model, language)) or []
 
 
 def save_cached_turns(file_id: str, model: str, language: str, turns: List[Dict]):
-    key = _cache_key(file_id, model, language)
-    fpth = DIAR / f"{key}.json"
-    fpth.write_text(json.dumps(turns))
-
-
-def generate_file_id(data: bytes, name: str) -> str:
-    digest = hashlib.sha256(data[:64]).hexdigest()[:8]
-    return f"{name}-{len(data)}-{digest}"
\ No newline at end of file
+    store.write_json("diar", _cache_key(file_id, model, language), turns)
@@ -0,0 +1,189 @@
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Columnar transcription results: a small JSON directory followed by
+# 8-byte-aligned typed arrays, read through an mmap so a reader only touches
+# the columns it asks for.
+#
+#   magic (8) | directory length (u64) | directory JSON | pad | columns …
+#
+# Segments become one array per field. Strings (segment text, word text)
+# are a UTF-8 blob plus an int64 offsets array; token ids and words are
+# ragged arrays with per-segment offsets. Anything outside that schema is
+# kept losslessly as one JSON string per segment ("extra").
+
+MAGIC = b"SONR\x01\x00\x00\x00"
+SUFFIX = ".sonr"
+
+INT_FIELDS = ("id", "seek")
+FLOAT_FIELDS = ("start", "end", "temperature", "avg_logprob", "compression_ratio", "no_speech_prob")
+WORD_KEYS = ("word", "start", "end", "probability")
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _string_table(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(blobs) + 1, dtype="<i8")
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(blobs), dtype="u1")
+
+
+def _ragged(lists: Sequence[Sequence]) -> np.ndarray:
+    offsets = np.zeros(len(lists) + 1, dtype="<i8")
+    np.cumsum([len(x) for x in lists], out=offsets[1:])
+    return offsets
+
+
+def write_result(path: str | Path, result: Dict[str, Any]):
+    """Write a Whisper-style result ({"text", "segments", …}) in columnar form."""
+    segments: List[Dict[str, Any]] = result.get("segments") or []
+    columns: Dict[str, np.ndarray] = {}
+    handled = {"text"}
+
+    for name, dtype in [(f, "<i8") for f in INT_FIELDS] + [(f, "<f8") for f in FLOAT_FIELDS]:
+        if segments and all(_is_number(s.get(name)) for s in segments):
+            columns[name] = np.array([s[name] for s in segments], dtype=dtype)
+            handled.add(name)
+
+    columns["text.off"], columns["text.data"] = _string_table(s.get("text", "") for s in segments)
+
+    if segments and all(isinstance(s.get("tokens"), list) and all(isinstance(t, int) for t in s["tokens"])
+                        for s in segments):
+        columns["tokens.off"] = _ragged([s["tokens"] for s in segments])
+        columns["tokens"] = np.array([t for s in segments for t in s["tokens"]], dtype="<i4")
+        handled.add("tokens")
+
+    if segments and all(
+            isinstance(s.get("words"), list)
+            and all(isinstance(w, dict) and tuple(sorted(w)) == tuple(sorted(WORD_KEYS)) for w in s["words"])
+            for s in segments):
+        words = [w for s in segments for w in s["words"]]
+        columns["words.off"] = _ragged([s["words"] for s in segments])
+        columns["word.start"] = np.array([w["start"] for w in words], dtype="<f8")
+        columns["word.end"] = np.array([w["end"] for w in words], dtype="<f8")
+        columns["word.probability"] = np.array([w["probability"] for w in words], dtype="<f8")
+        columns["word.off"], columns["word.data"] = _string_table(w["word"] for w in words)
+        handled.add("words")
+
+    extras = [{k: v for k, v in s.items() if k not in handled} for s in segments]
+    if any(extras):
+        columns["extra.off"], columns["extra.data"] = _string_table(
+            json.dumps(e, ensure_ascii=False, separators=(",", ":")) for e in extras
+        )
+
+    text = result.get("text", "")
+    columns["result.text"] = np.frombuffer(text.encode("utf-8"), dtype="u1")
+    meta = {k: v for k, v in result.items() if k not in ("text", "segments")}
+
+    # column offsets are relative to the first 8-byte boundary after the directory
+    layout, pos = {}, 0
+    for name, arr in columns.items():
+        layout[name] = [arr.dtype.str, pos, int(arr.size)]
+        pos += -(-arr.nbytes // 8) * 8
+    head = json.dumps({"n": len(segments), "meta": meta, "columns": layout}, ensure_ascii=False).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(head)))
+        f.write(head)
+        f.write(b"\0" * (-(16 + len(head)) % 8))
+        for name, arr in columns.items():
+            data = arr.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+
+
+class _Reader:
+    def __init__(self, mm: mmap.mmap, directory: Dict[str, Any]):
+        self.mm = mm
+        self.dir = directory["columns"]
+        self.base = directory["base"]
+
+    def has(self, name: str) -> bool:
+        return name in self.dir
+
+    def values(self, name: str) -> list:
+        dtype, offset, count = self.dir[name]
+        return np.frombuffer(self.mm, dtype=dtype, count=count, offset=self.base + offset).tolist()
+
+    def raw(self, name: str) -> bytes:
+        _, offset, count = self.dir[name]
+        offset += self.base
+        return self.mm[offset:offset + count]
+
+    def strings(self, prefix: str) -> List[str]:
+        off = self.values(f"{prefix}.off")
+        data = self.raw(f"{prefix}.data")
+        return [data[a:b].decode("utf-8") for a, b in zip(off, off[1:])]
+
+
+def _open(path: str | Path):
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    if mm[:8] != MAGIC or len(mm) < 16:
+        mm.close()
+        raise ValueError(f"Not a columnar result: {path}")
+    (length,) = struct.unpack("<Q", mm[8:16])
+    directory = json.loads(mm[16:16 + length].decode("utf-8"))
+    directory["base"] = -(-(16 + length) // 8) * 8
+    return mm, directory
+
+
+def read_header(path: str | Path) -> Dict[str, Any]:
+    """Directory of a columnar file (segment count, metadata, column layout)."""
+    mm, directory = _open(path)
+    mm.close()
+    return directory
+
+
+def read_result(path: str | Path, fields: Sequence[str] | None = None) -> Dict[str, Any]:
+    """
+    Load a columnar result. `fields` limits the segment keys that are
+    materialized (e.g. ("start", "end", "text")); other columns are never
+    read from disk. Top-level text and metadata are always returned.
+    """
+    mm, directory = _open(path)
+    try:
+        r = _Reader(mm, directory)
+        n = directory["n"]
+        want = (lambda k: True) if fields is None else set(fields).__contains__
+        cols: Dict[str, list] = {}
+        for name in INT_FIELDS + FLOAT_FIELDS:
+            if want(name) and r.has(name):
+                cols[name] = r.values(name)
+        if want("text"):
+            cols["text"] = r.strings("text")
+        if want("tokens") and r.has("tokens"):
+            off, toks = r.values("tokens.off"), r.values("tokens")
+            cols["tokens"] = [toks[a:b] for a, b in zip(off, off[1:])]
+        if want("words") and r.has("words.off"):
+            off = r.values("words.off")
+            flat = [
+                {"word": w, "start": s, "end": e, "probability": p}
+                for w, s, e, p in zip(r.strings("word"), r.values("word.start"),
+                                      r.values("word.end"), r.values("word.probability"))
+            ]
+            cols["words"] = [flat[a:b] for a, b in zip(off, off[1:])]
+        extras = [json.loads(e) for e in r.strings("extra")] if r.has("extra.off") else None
+
+        segments = []
+        for i in range(n):
+            seg = {k: v[i] for k, v in cols.items()}
+            if extras:
+                seg.update((k, v) for k, v in extras[i].items() if want(k))
+            segments.append(seg)
+        text = r.raw("result.text").decode("utf-8")
+        return {"text": text, **directory["meta"], "segments": segments}
+    finally:
+        mm.close()
@@ -0,0 +1,213 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from .profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+RSS_INTERVAL = 0.05  # seconds between RSS samples while a stage runs
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss() -> int:
+    """Current resident set size in bytes (Linux; 0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _PeakRss:
+    """
+    Peak RSS of each running stage, sampled by one shared background thread.
+
+    `ru_maxrss` / VmHWM only give the peak over the process lifetime, and
+    resetting them would disturb stages running concurrently on other
+    threads, so each stage keeps the highest sample seen while it runs.
+    """
+
+    def __init__(self, interval: float = RSS_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Condition()
+        self._peaks: Dict[int, int] = {}
+        self._tokens = itertools.count()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> int:
+        rss = _rss()
+        with self._lock:
+            token = next(self._tokens)
+            self._peaks[token] = rss
+            if rss and self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="sonify-rss", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+        return token
+
+    def stop(self, token: int) -> int:
+        rss = _rss()
+        with self._lock:
+            return max(self._peaks.pop(token), rss)
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                while not self._peaks:
+                    self._lock.wait()
+            rss = _rss()
+            with self._lock:
+                for token, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[token] = rss
+            time.sleep(self.interval)
+
+
+class Metrics:
+    """
+    Process-wide per-stage counters.
+
+    `stage(name, audio_seconds)` records wall and CPU time, audio processed
+    and the peak RSS sampled while the stage ran; `cache(kind, hit)` counts
+    lookups per cache layer. Every finished stage is also logged on this
+    module's logger as one JSON object (DEBUG, or INFO after
+    `enable_events()`). Worker processes ship their counters back with
+    `snapshot()` / `merge()`. Stages are also the unit of optional
+    profiling (see `sonify.utils.profiling`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rss = _PeakRss()
+        self.events_level = logging.DEBUG
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages: Dict[str, Dict[str, float]] = {}
+            self.caches: Dict[str, Dict[str, int]] = {}
+
+    def enable_events(self):
+        self.events_level = logging.INFO
+
+    @contextmanager
+    def stage(self, name: str, audio_seconds: float | None = None, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the enclosed block. The yielded dict may be updated inside the
+        block (e.g. `info["audio_seconds"] = …` once it is known).
+        """
+        info: Dict[str, Any] = {"audio_seconds": audio_seconds, **labels}
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        rss = self._rss.start()
+        ok = False
+        try:
+            with profiler.stage(name):
+                yield info
+            ok = True
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            peak = self._rss.stop(rss)
+            self.record(name, wall, cpu, info.pop("audio_seconds", None), ok, peak, **info)
+
+    def record(self, name: str, wall: float, cpu: float, audio_seconds: float | None = None,
+               ok: bool = True, peak: int = 0, **labels: Any):
+        with self._lock:
+            s = self.stages.setdefault(name, {"runs": 0, "errors": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                              "audio_seconds": 0.0, "peak_rss_bytes": 0})
+            s["runs"] += 1
+            s["errors"] += 0 if ok else 1
+            s["wall_seconds"] += wall
+            s["cpu_seconds"] += cpu
+            s["audio_seconds"] += audio_seconds or 0.0
+            s["peak_rss_bytes"] = max(s["peak_rss_bytes"], peak)
+        if logger.isEnabledFor(self.events_level):
+            event = {"event": "stage", "stage": name, "ok": ok, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+                     "peak_rss_mb": round(peak / (1 << 20), 1), **labels}
+            if audio_seconds:
+                event["audio_s"] = round(audio_seconds, 3)
+                event["rtf"] = round(wall / audio_seconds, 4)
+            logger.log(self.events_level, json.dumps(event, default=str))
+
+    def cache(self, kind: str, hit: bool):
+        with self._lock:
+            c = self.caches.setdefault(kind, {"hits": 0, "misses": 0})
+            c["hits" if hit else "misses"] += 1
+
+    # -- transfer between processes --------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"stages": {k: dict(v) for k, v in self.stages.items()},
+                    "caches": {k: dict(v) for k, v in self.caches.items()}}
+
+    def merge(self, snap: Dict[str, Any]):
+        with self._lock:
+            for name, other in snap.get("stages", {}).items():
+                s = self.stages.setdefault(name, {k: 0 for k in other})
+                for k, v in other.items():
+                    s[k] = max(s.get(k, 0), v) if k == "peak_rss_bytes" else s.get(k, 0) + v
+            for kind, other in snap.get("caches", {}).items():
+                c = self.caches.setdefault(kind, {"hits": 0, "misses": 0})
+                c["hits"] += other["hits"]
+                c["misses"] += other["misses"]
+
+    # -- reporting --------------------------------------------------------------
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage totals with real-time factor (wall / audio seconds), plus cache hit rates."""
+        snap = self.snapshot()
+        for s in snap["stages"].values():
+            s["wall_seconds"] = round(s["wall_seconds"], 3)
+            s["cpu_seconds"] = round(s["cpu_seconds"], 3)
+            s["rtf"] = round(s["wall_seconds"] / s["audio_seconds"], 4) if s["audio_seconds"] else None
+        for c in snap["caches"].values():
+            lookups = c["hits"] + c["misses"]
+            c["hit_rate"] = round(c["hits"] / lookups, 3) if lookups else None
+        return snap
+
+    def prometheus(self) -> str:
+        """Counters in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, rows):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{{{labels}}} {value}" for labels, value in rows)
+
+        stages = sorted(snap["stages"].items())
+        family("sonify_stage_runs_total", "counter", "Completed runs per stage",
+               [(f'stage="{k}"', v["runs"]) for k, v in stages])
+        family("sonify_stage_errors_total", "counter", "Failed runs per stage",
+               [(f'stage="{k}"', v["errors"]) for k, v in stages])
+        family("sonify_stage_wall_seconds_total", "counter", "Wall-clock time per stage",
+               [(f'stage="{k}"', round(v["wall_seconds"], 6)) for k, v in stages])
+        family("sonify_stage_cpu_seconds_total", "counter", "Process CPU time per stage",
+               [(f'stage="{k}"', round(v["cpu_seconds"], 6)) for k, v in stages])
+        family("sonify_stage_audio_seconds_total", "counter", "Audio processed per stage",
+               [(f'stage="{k}"', round(v["audio_seconds"], 3)) for k, v in stages])
+        family("sonify_stage_peak_rss_bytes", "gauge", "Highest resident memory sampled while a stage ran",
+               [(f'stage="{k}"', int(v["peak_rss_bytes"])) for k, v in stages])
+        family("sonify_cache_lookups_total", "counter", "Cache lookups per layer and outcome",
+               [(f'kind="{k}",result="{r}"', v[key]) for k, v in sorted(snap["caches"].items())
+                for r, key in (("hit", "hits"), ("miss", "misses"))])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path):
+        """Write a textfile-collector file (atomically, so scrapes never see half a file)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Tuple
+
+from sonify.utils.metrics import metrics
+from sonify.utils.resources import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Default RAM budget for resident models, in bytes (0 = unlimited)
+DEFAULT_RAM_BUDGET = int(os.environ.get("SONIFY_MODEL_RAM_BUDGET", str(6 << 30)))
+
+
+def _torch_nbytes(model: Any) -> int:
+    """Approximate resident size of a torch module (parameters + buffers)."""
+    total = 0
+    for attr in ("parameters", "buffers"):
+        fn = getattr(model, attr, None)
+        if fn is None:
+            continue
+        for t in fn():
+            total += t.numel() * t.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Process-wide LRU registry of loaded models.
+
+    `get(*key, **load_kwargs)` loads a model once via
+    `loader(*key, **load_kwargs)` and hands the same instance to every later
+    caller; `load_kwargs` (e.g. credentials) are not part of the key. When
+    the summed size of resident models exceeds `ram_budget` bytes,
+    least-recently-used entries are evicted; the entry just requested is
+    never evicted.
+
+    Inference must go through `use()`, which also holds the entry's
+    inference lock: Whisper installs kv-cache hooks on the module while it
+    decodes, so concurrent calls on one instance corrupt each other.
+    """
+
+    def __init__(
+            self,
+            loader: Callable[..., Any],
+            ram_budget: int = DEFAULT_RAM_BUDGET,
+            sizer: Callable[[Any], int] = _torch_nbytes,
+            name: str = "models",
+    ):
+        self.loader = loader
+        self.ram_budget = ram_budget
+        self.sizer = sizer
+        self.name = name
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._inference: Dict[Tuple[Hashable, ...], threading.RLock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, *key: Hashable, **load_kwargs: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            t0 = time.perf_counter()
+            with metrics.stage("model_load", model=self.name):
+                model = self.loader(*key, **load_kwargs)
+            elapsed = time.perf_counter() - t0
+            self.load_seconds += elapsed
+            self._entries[key] = (model, self.sizer(model))
+            self._inference[key] = threading.RLock()
+            logger.debug(f"Loaded {self.name} {key} in {elapsed:.2f}s")
+            self._evict(keep=key)
+            return model
+
+    @contextmanager
+    def use(self, *key: Hashable, **load_kwargs: Any) -> Iterator[Any]:
+        """`get()`, holding the model's inference lock for the duration of the block."""
+        with self._lock:
+            model = self.get(*key, **load_kwargs)
+            lock = self._inference[key]
+        with lock:
+            yield model
+
+    def _evict(self, keep: Tuple[Hashable, ...]):
+        if not self.ram_budget:
+            return
+        while self.resident_bytes() > self.ram_budget and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            del self._entries[key]
+            self._inference.pop(key, None)  # current users keep their reference
+            self.evictions += 1
+            logger.debug(f"Evicted {self.name} {key} (budget {self.ram_budget} bytes)")
+
+    def unload(self, *key: Hashable) -> bool:
+        """Drop one entry (or all entries when called without a key)."""
+        with self._lock:
+            if not key:
+                dropped = bool(self._entries)
+                self._entries.clear()
+                self._inference.clear()
+                return dropped
+            self._inference.pop(key, None)
+            return self._entries.pop(key, None) is not None
+
+    def set_budget(self, ram_budget: int):
+        with self._lock:
+            self.ram_budget = ram_budget
+            if self._entries:
+                self._evict(keep=next(reversed(self._entries)))
+
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+                "resident_bytes": self.resident_bytes(),
+                "ram_budget": self.ram_budget,
+                "resident": [list(k) for k in self._entries],
+            }
+
+
+# -----------------------------------------------------------------------------
+# Whisper
+# -----------------------------------------------------------------------------
+
+def _default_device() -> str:
+    if os.environ.get("SONIFY_DEVICE"):
+        return os.environ["SONIFY_DEVICE"]
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_whisper(model_name: str, device: str, dtype: str):
+    import whisper
+    scheduler.torch_threads()
+    model = whisper.load_model(model_name, device=device)
+    if dtype == "float16":
+        model = model.half()
+    return model
+
+
+whisper_models = ModelRegistry(_load_whisper, name="whisper model")
+
+
+def get_whisper_model(model_name: str, device: str | None = None, dtype: str = "float32"):
+    """Return the shared Whisper model for (model_name, device, dtype)."""
+    return whisper_models.get(model_name, device or _default_device(), dtype)
+
+
+def whisper_model(model_name: str, device: str | None = None, dtype: str = "float32"):
+    """Context manager: the shared Whisper model, reserved for this caller's inference."""
+    return whisper_models.use(model_name, device or _default_device(), dtype)
+
+
+# -----------------------------------------------------------------------------
+# pyannote
+# -----------------------------------------------------------------------------
+
+DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
+
+
+def _token_id(hf_token: str | None) -> str:
+    """Stable, non-secret stand-in for a token in registry keys and stats."""
+    return hashlib.sha256((hf_token or "").encode()).hexdigest()[:12]
+
+
+def _patched_stats_pool_forward(self, sequences, weights=None):
+    import torch
+    mean = sequences.mean(dim=-1)
+    if sequences.size(-1) > 1:
+        std = sequences.std(dim=-1, correction=1)
+    else:
+        std = torch.zeros_like(mean)
+    return torch.cat([mean, std], dim=-1)
+
+
+def _patch_stats_pool():
+    """Patch pyannote's StatsPool; done when a pipeline is first built, not at import."""
+    from pyannote.audio.models.blocks.pooling import StatsPool
+    StatsPool.forward = _patched_stats_pool_forward
+
+
+def _load_pipeline(model_id: str, token_id: str, hf_token: str | None = None):
+    import torch
+    from pyannote.audio import Pipeline
+    scheduler.torch_threads()
+    _patch_stats_pool()
+    pipeline = Pipeline.from_pretrained(model_id, use_auth_token=hf_token)
+    if pipeline is None:
+        raise RuntimeError(f"Could not load {model_id}; check the HuggingFace token and model conditions")
+    if torch.cuda.is_available():
+        pipeline.to(torch.device("cuda"))
+    return pipeline
+
+
+# Pipelines are not plain modules, so they are never evicted by size;
+# use `unload()` to release them.
+diarization_pipelines = ModelRegistry(
+    _load_pipeline, ram_budget=0, sizer=lambda _: 0, name="diarization pipeline"
+)
+
+
+def get_diarization_pipeline(hf_token: str | None, model_id: str = DIARIZATION_MODEL):
+    """Return the shared pyannote pipeline for (model_id, token)."""
+    return diarization_pipelines.get(model_id, _token_id(hf_token), hf_token=hf_token)
+
+
+def diarization_pipeline(hf_token: str | None, model_id: str = DIARIZATION_MODEL):
+    """Context manager: the shared pyannote pipeline, reserved for this caller's run."""
+    return diarization_pipelines.use(model_id, _token_id(hf_token), hf_token=hf_token)
@@ -0,0 +1,171 @@
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cpu", "torch", "all")
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+TOP_N = 30
+
+# Profiling is configured through the environment so that spawned pool and
+# batch workers pick it up without extra plumbing (see `Profiler.configure`).
+ENV_MODE = "SONIFY_PROFILE"
+ENV_DIR = "SONIFY_PROFILE_DIR"
+ENV_STAGES = "SONIFY_PROFILE_STAGES"
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack and counts the stacks in folded form."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="sonify-profiler", daemon=True)
+        self.target = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = getattr(code, "co_qualname", code.co_name)
+                stack.append(f"{frame.f_globals.get('__name__', '?')}.{name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def write_folded(self, path: Path):
+        """`frame;frame;frame count` lines, as read by flamegraph.pl, speedscope or inferno."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _sibling(base: Path, ext: str) -> Path:
+    return base.parent / (base.name + ext)  # not with_suffix: the prefix ends in ".<n>"
+
+
+@contextmanager
+def _cpu_profile(base: Path) -> Iterator[None]:
+    sampler = _Sampler(threading.get_ident())
+    prof = cProfile.Profile()
+    sampler.start()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        sampler.stop()
+        sampler.write_folded(_sibling(base, ".folded"))
+        prof.dump_stats(_sibling(base, ".pstats"))
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(TOP_N)
+        _sibling(base, ".top.txt").write_text(out.getvalue(), encoding="utf-8")
+
+
+@contextmanager
+def _torch_profile(base: Path) -> Iterator[None]:
+    try:
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        logger.warning("torch is not installed; skipping operator profiling")
+        yield
+        return
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    with profile(activities=activities) as prof:
+        yield
+    sort_by = "self_cuda_time_total" if ProfilerActivity.CUDA in activities else "self_cpu_time_total"
+    table = prof.key_averages().table(sort_by=sort_by, row_limit=TOP_N)
+    _sibling(base, ".ops.txt").write_text(table + "\n", encoding="utf-8")
+    prof.export_chrome_trace(str(_sibling(base, ".trace.json")))
+
+
+class Profiler:
+    """
+    Optional per-stage profiling.
+
+    Every `metrics.stage(...)` block runs inside `profiler.stage(name)`, which
+    does nothing unless profiling is configured. When it is, the outermost
+    selected stage on each thread writes, to the profile directory:
+
+    * mode "cpu": `<stage>.<pid>.<n>.folded` (sampled stacks for flame
+      graphs), `.pstats` (cProfile) and `.top.txt` (top functions);
+    * mode "torch": `.ops.txt` (top torch operators) and `.trace.json`
+      (chrome://tracing / Perfetto);
+    * mode "all": both.
+
+    Nested stages are covered by their enclosing profile and skipped, since
+    only one cProfile / torch profiler can be active per thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._seq = itertools.count()
+
+    def configure(self, mode: str, out_dir: str | Path, stages: Sequence[str] | None = None):
+        """Enable profiling for this process and any workers it starts."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r} (expected one of {', '.join(MODES)})")
+        os.environ[ENV_MODE] = mode
+        os.environ[ENV_DIR] = str(out_dir)
+        if stages:
+            os.environ[ENV_STAGES] = ",".join(stages)
+        else:
+            os.environ.pop(ENV_STAGES, None)
+
+    @property
+    def mode(self) -> str | None:
+        return os.environ.get(ENV_MODE) or None
+
+    def selected(self, name: str) -> bool:
+        if self.mode is None:
+            return False
+        stages = os.environ.get(ENV_STAGES)
+        return not stages or name in stages.split(",")
+
+    def stage(self, name: str):
+        """Profile the enclosed block if profiling is on and `name` is selected."""
+        if not self.selected(name) or getattr(self._local, "active", False):
+            return nullcontext()
+        return self.profile(name)
+
+    @contextmanager
+    def profile(self, name: str, mode: str | None = None, out_dir: str | Path | None = None) -> Iterator[Path]:
+        """
+        Profile the enclosed block unconditionally (e.g. a whole run); yields
+        the output path prefix. Defaults come from `configure()`.
+        """
+        mode = mode or self.mode or "cpu"
+        out = Path(out_dir or os.environ.get(ENV_DIR) or "profile")
+        out.mkdir(parents=True, exist_ok=True)
+        base = out / f"{name}.{os.getpid()}.{next(self._seq)}"
+        outer, self._local.active = getattr(self._local, "active", False), True
+        try:
+            with _cpu_profile(base) if mode in ("cpu", "all") else nullcontext():
+                with _torch_profile(base) if mode in ("torch", "all") else nullcontext():
+                    yield base
+        finally:
+            self._local.active = outer
+            logger.info(f"Profile for {name} written to {base}.*")
+
+
+profiler = Profiler()
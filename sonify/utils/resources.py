@@ -0,0 +1,182 @@
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Environment-backed like the profiling settings (see `sonify.utils.profiling`);
+# `configure()` updates them.
+ENV_CPUS = "SONIFY_CPUS"  # cores sonify may use on this machine (0 / unset = all allowed)
+ENV_PIN = "SONIFY_PIN"  # "1": pin each worker to its cores with CPU affinity
+ENV_INTEROP = "SONIFY_INTEROP_THREADS"  # torch inter-op threads per process
+_ENV_CORES = "SONIFY_CORE_SET"  # cores a parent handed to this process (internal)
+
+DEFAULT_INTEROP = 1
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _allowed_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_slot(slots, initializer: Callable | None, initargs: tuple):
+    """Pool initializer: take this worker's core group, apply it, then run the real initializer."""
+    scheduler.apply(slots.get())
+    if initializer:
+        initializer(*initargs)
+
+
+class ResourceScheduler:
+    """
+    Hands out CPU cores to transcription and diarization workers.
+
+    The budget is the allowed cores, optionally capped at `SONIFY_CPUS`. Pools
+    made by `pool()` split it into one contiguous core group per worker. Each
+    worker sets its torch intra-op threads, OMP/MKL/OpenBLAS thread counts
+    and (with pinning) CPU affinity to its group before it loads a model, so
+    concurrent workers never oversubscribe the machine. Nested pools (e.g.
+    chunk workers inside a batch worker) split their parent's group.
+    """
+
+    def configure(self, cpus: int | None = None, pin: bool | None = None, interop: int | None = None):
+        """Set the policy for this process and any workers it starts."""
+        if cpus is not None:
+            os.environ[ENV_CPUS] = str(max(0, cpus))
+            os.environ.pop(_ENV_CORES, None)
+        if pin is not None:
+            os.environ[ENV_PIN] = "1" if pin else "0"
+        if interop is not None:
+            os.environ[ENV_INTEROP] = str(max(1, interop))
+
+    @property
+    def pin(self) -> bool:
+        return os.environ.get(ENV_PIN, "0") == "1"
+
+    @property
+    def interop(self) -> int:
+        return int(os.environ.get(ENV_INTEROP) or DEFAULT_INTEROP)
+
+    def cores(self) -> List[int]:
+        """Cores this process may use."""
+        assigned = os.environ.get(_ENV_CORES)
+        if assigned:
+            return [int(c) for c in assigned.split(",")]
+        allowed = _allowed_cores()
+        cpus = int(os.environ.get(ENV_CPUS) or 0)
+        return allowed[:cpus] if cpus > 0 else allowed
+
+    def split(self, n: int, shares: Sequence[float] | None = None,
+              cores: Sequence[int] | None = None) -> List[List[int]]:
+        """
+        Split `cores` (default: this process's budget) into `n` contiguous
+        groups sized by `shares` (default: equal), each with at least one
+        core. With fewer cores than groups, groups share cores round-robin.
+        """
+        cores = list(cores or self.cores())
+        if n >= len(cores):
+            return [[cores[i % len(cores)]] for i in range(n)]
+        shares = list(shares or [1.0] * n)
+        total = sum(shares) or 1.0
+        sizes = [max(1, round(len(cores) * s / total)) for s in shares]
+        while sum(sizes) > len(cores):
+            sizes[sizes.index(max(sizes))] -= 1
+        i = 0
+        while sum(sizes) < len(cores):
+            sizes[i % n] += 1
+            i += 1
+        groups, pos = [], 0
+        for size in sizes:
+            groups.append(cores[pos:pos + size])
+            pos += size
+        return groups
+
+    def apply(self, cores: Sequence[int]):
+        """Restrict this process to `cores`. Takes full effect when called before torch loads a model."""
+        cores = list(cores)
+        os.environ[_ENV_CORES] = ",".join(map(str, cores))
+        for var in THREAD_VARS:
+            os.environ[var] = str(len(cores))
+        if self.pin and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError as exc:
+                logger.warning(f"Could not pin to cores {cores}: {exc}")
+        if "torch" in sys.modules:
+            self.torch_threads()
+
+    def torch_threads(self):
+        """Size torch's thread pools to this process's budget (called before every model load)."""
+        import torch
+        threads = len(self.cores())
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+        if torch.get_num_interop_threads() != self.interop:
+            try:
+                torch.set_interop_threads(self.interop)
+            except RuntimeError:
+                pass  # only allowed before the first inter-op parallel work in this process
+
+    @contextmanager
+    def using(self, cores: Sequence[int]) -> Iterator[List[int]]:
+        """Temporarily restrict this process (e.g. while a sibling process has the other cores)."""
+        saved = {var: os.environ.get(var) for var in (_ENV_CORES,) + THREAD_VARS}
+        affinity = os.sched_getaffinity(0) if self.pin and hasattr(os, "sched_getaffinity") else None
+        self.apply(cores)
+        try:
+            yield list(cores)
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+            if affinity is not None:
+                os.sched_setaffinity(0, affinity)
+            if "torch" in sys.modules:
+                self.torch_threads()
+
+    def pool(self, workers: int, initializer: Callable | None = None, initargs: tuple = (),
+             cores: Sequence[int] | None = None) -> ProcessPoolExecutor:
+        """
+        A spawn-based process pool whose workers each own one core group of
+        `cores` (default: this process's budget). `initializer` runs after
+        the worker's thread settings are in place, so models it loads use them.
+        """
+        ctx = multiprocessing.get_context("spawn")
+        slots = ctx.SimpleQueue()
+        groups = self.split(workers, cores=cores)
+        for group in groups:
+            slots.put(group)
+        logger.debug(f"Worker core groups: {groups}{' (pinned)' if self.pin else ''}")
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_slot,
+            initargs=(slots, initializer, initargs),
+        )
+
+    def describe(self) -> str:
+        cores = self.cores()
+        return (f"{len(cores)} cores ({_ranges(cores)}), interop threads {self.interop}, "
+                f"{'pinned' if self.pin else 'not pinned'}")
+
+
+def _ranges(cores: Sequence[int]) -> str:
+    """0,1,2,3,6 -> '0-3,6'"""
+    out, start = [], None
+    for i, c in enumerate(cores):
+        if start is None:
+            start = c
+        if i + 1 == len(cores) or cores[i + 1] != c + 1:
+            out.append(str(start) if start == c else f"{start}-{c}")
+            start = None
+    return ",".join(out)
+
+
+scheduler = ResourceScheduler()
@@ -1,5 +1,48 @@
+import threading
+import weakref
+from pathlib import Path
+from typing import BinaryIO, Dict
+
 import streamlit as st
 
+from sonify.utils.cache import store
+
+# Live sessions holding each stored upload, by digest
+_upload_refs: Dict[str, int] = {}
+_refs_lock = threading.Lock()
+
+
+def _release_upload(digest: str, suffix: str):
+    with _refs_lock:
+        _upload_refs[digest] -= 1
+        if _upload_refs[digest] > 0:
+            return
+        del _upload_refs[digest]
+    store.remove("uploads", digest, suffix)
+
+
+class Upload:
+    """
+    An uploaded file held in the cache store for one session.
+
+    The stored copy is removed once no live session references it any more,
+    i.e. when the session is restarted, replaces its upload or ends and its
+    state is garbage-collected. The converted WAV stays in the cache.
+    """
+
+    def __init__(self, digest: str, path: Path):
+        self.digest = digest
+        self.path = path
+        with _refs_lock:
+            _upload_refs[digest] = _upload_refs.get(digest, 0) + 1
+        weakref.finalize(self, _release_upload, digest, path.suffix)
+
+    @classmethod
+    def ingest(cls, src: BinaryIO, suffix: str = "") -> "Upload":
+        """Stream `src` into the store, hashing it on the way in."""
+        digest, path = store.ingest(src, suffix)
+        return cls(digest, path)
+
 
 def init_session():
     """Initialize session state and decrypt stored HF token if present."""
@@ -7,18 +50,28 @@ def init_session():
     st.session_state.setdefault("cfg", {
         "model": "medium",
         "language": "de",
+        "workers": 1,
+        "vad": False,
+        "batch_size": 1,
         "hf_token": st.secrets["hf_token"]
     })
     # Workflow state
     st.session_state.setdefault("phase", "start")
+    st.session_state.setdefault("upload", None)
     st.session_state.setdefault("audio_path", None)
+    st.session_state.setdefault("duration", None)
     st.session_state.setdefault("file_id", None)
     st.session_state.setdefault("segments", [])
+    st.session_state.setdefault("transcript_md", None)
+    st.session_state.setdefault("transcript_txt", None)
     st.session_state.setdefault("turns", [])
     st.session_state.setdefault("file_uploader_key", 0)
     st.session_state.setdefault("speaker_names", {})
+    st.session_state.setdefault("diar_future", None)
+    st.session_state.setdefault("job_key", None)
 
 
 def reset_state():
-    for k in ["phase", "audio_path", "file_id", "segments", "turns"]:
+    for k in ["phase", "upload", "audio_path", "duration", "file_id", "segments", "transcript_md", "transcript_txt",
+              "turns", "diar_future", "job_key"]:
         st.session_state[k] = None if k != "phase" else "start"
@@ -0,0 +1,106 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from sonify.utils.audio import SAMPLE_RATE
+
+# Whisper decodes at most 30 s of audio per window
+MAX_WINDOW = 30.0
+
+
+def frame_energy_db(samples: np.ndarray, frame: int, block: int = 4096) -> np.ndarray:
+    """Per-frame RMS level in dBFS of an int16 signal, computed in bounded blocks."""
+    n_frames = len(samples) // frame
+    out = np.empty(n_frames, dtype=np.float32)
+    for i in range(0, n_frames, block):
+        j = min(i + block, n_frames)
+        x = samples[i * frame:j * frame].astype(np.float32).reshape(-1, frame) / 32768.0
+        out[i:j] = 10.0 * np.log10(np.mean(x * x, axis=1) + 1e-10)
+    return out
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """(start, stop) frame indices of consecutive True runs."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def speech_regions(
+        energy: np.ndarray,
+        frame_ms: int = 30,
+        margin_db: float = 12.0,
+        floor_db: float = -55.0,
+        min_speech_ms: int = 250,
+        min_silence_ms: int = 600,
+        pad_ms: int = 200,
+) -> List[Tuple[int, int]]:
+    """
+    Frame spans that contain speech, from an energy envelope.
+
+    A frame counts as voiced when it is `margin_db` above the noise floor
+    (10th percentile) and above `floor_db`. Gaps shorter than
+    `min_silence_ms` are bridged, blips shorter than `min_speech_ms` dropped,
+    and every region is padded by `pad_ms` so word onsets survive.
+    """
+    if len(energy) == 0:
+        return []
+    threshold = max(float(np.percentile(energy, 10)) + margin_db, floor_db)
+    regions = _runs(energy > threshold)
+
+    pad = pad_ms // frame_ms
+    min_gap = min_silence_ms // frame_ms
+    min_len = min_speech_ms // frame_ms
+    merged: List[List[int]] = []
+    for s, e in regions:
+        s, e = max(0, s - pad), min(len(energy), e + pad)
+        if merged and s - merged[-1][1] < min_gap:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return [(s, e) for s, e in merged if e - s >= min_len]
+
+
+def _split_long(energy: np.ndarray, s: int, e: int, max_frames: int) -> List[Tuple[int, int]]:
+    """Cut an over-long region at its quietest frame in the back half of each window."""
+    out = []
+    while e - s > max_frames:
+        lo, hi = s + max_frames // 2, s + max_frames
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        out.append((s, cut))
+        s = cut
+    out.append((s, e))
+    return out
+
+
+def vad_spans(
+        samples: np.ndarray,
+        max_chunk: float = MAX_WINDOW,
+        sr: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        **kwargs,
+) -> List[Tuple[int, int]]:
+    """
+    Variable-length (start, stop) sample spans covering only voiced audio.
+
+    Speech regions are packed greedily into windows of at most
+    `min(max_chunk, 30)` seconds, so every cut falls in silence unless a
+    single utterance is longer than a window; pure-silence stretches between
+    windows are skipped entirely.
+    """
+    frame = sr * frame_ms // 1000
+    energy = frame_energy_db(samples, frame)
+    max_frames = int(min(max_chunk, MAX_WINDOW) * 1000) // frame_ms
+
+    chunks: List[List[int]] = []
+    for region in speech_regions(energy, frame_ms=frame_ms, **kwargs):
+        for s, e in _split_long(energy, *region, max_frames):
+            if chunks and e - chunks[-1][0] <= max_frames:
+                chunks[-1][1] = e
+            else:
+                chunks.append([s, e])
+
+    spans = [(s * frame, e * frame) for s, e in chunks]
+    # the trailing partial frame belongs to a region that runs to the end
+    if spans and chunks[-1][1] == len(energy):
+        spans[-1] = (spans[-1][0], len(samples))
+    return spans
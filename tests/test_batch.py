@@ -0,0 +1,26 @@
+from sonify.batch import Manifest, expand_inputs, output_names
+
+
+def test_output_names_mirror_input_tree(tmp_path):
+    for rel in ("a/x.mp3", "b/x.mp3", "y.wav"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).touch()
+    files = expand_inputs([str(tmp_path)])
+    names = output_names(files, [str(tmp_path)])
+    assert sorted(names.values()) == ["a/x", "b/x", "y"]
+
+
+def test_output_names_disambiguate_same_relative_path(tmp_path):
+    for root in ("one", "two"):
+        (tmp_path / root).mkdir()
+        (tmp_path / root / "x.mp3").touch()
+    inputs = [str(tmp_path / "one"), str(tmp_path / "two")]
+    names = output_names(expand_inputs(inputs), inputs)
+    assert len(set(names.values())) == 2
+
+
+def test_manifest_keys_by_resolved_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = Manifest(tmp_path / "m.jsonl")
+    manifest.record("x.mp3", "done")
+    assert manifest.load()[Manifest.key("./x.mp3")]["status"] == "done"
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY = {"torch", "whisper", "pyannote", "lightning", "pytorch_lightning", "streamlit"}
+
+PROBES = {
+    "import": "import sonify.cli",
+    "help": "import sys; sys.argv = ['sonify', '--help']\n"
+            "from sonify.cli import main\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass",
+}
+
+
+def run_probe(code: str, home: Path) -> set:
+    """Heavy top-level modules loaded by `code` in a fresh interpreter."""
+    env = dict(os.environ, HOME=str(home), SONIFY_CACHE_DIR=str(home / "cache"),
+               PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    src = code + "\nimport json, sys\nprint(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))"
+    proc = subprocess.run([sys.executable, "-c", src], env=env, cwd=home,
+                          capture_output=True, text=True, check=True)
+    return set(json.loads(proc.stdout.strip().splitlines()[-1])) & HEAVY
+
+
+@pytest.mark.parametrize("probe", sorted(PROBES))
+def test_cli_import_is_light(probe, tmp_path):
+    assert run_probe(PROBES[probe], tmp_path) == set()
+    assert sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*")) == []
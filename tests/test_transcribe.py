@@ -0,0 +1,30 @@
+from sonify.align import align_segments
+from sonify.transcribe import _shift_segments
+
+
+def _chunk_result(text: str):
+    # one window-relative segment with two words, as Whisper returns per chunk
+    return {"segments": [{
+        "start": 1.0, "end": 5.0, "text": text,
+        "words": [{"word": f" {text}1", "start": 1.0, "end": 2.0, "probability": 0.9},
+                  {"word": f" {text}2", "start": 3.0, "end": 5.0, "probability": 0.9}],
+    }]}
+
+
+def test_shift_segments_shifts_words():
+    seg, = _shift_segments(_chunk_result("a"), 30.0)
+    assert (seg["start"], seg["end"]) == (31.0, 35.0)
+    assert [(w["start"], w["end"]) for w in seg["words"]] == [(31.0, 32.0), (33.0, 35.0)]
+
+
+def test_shift_segments_leaves_cached_result_untouched():
+    res = _chunk_result("a")
+    _shift_segments(res, 30.0)
+    assert res["segments"][0]["words"][0]["start"] == 1.0
+
+
+def test_word_alignment_on_chunked_result():
+    segments = _shift_segments(_chunk_result("a"), 0.0) + _shift_segments(_chunk_result("b"), 30.0)
+    turns = [("A", 0.0, 30.0), ("B", 30.0, 65.0)]
+    aligned = align_segments(turns, segments, use_words=True)
+    assert [(t["speaker"], t["text"].split()) for t in aligned] == [("A", ["a1", "a2"]), ("B", ["b1", "b2"])]